@@ -0,0 +1,15 @@
+"""Benchmarks for the generation pipeline, run with `python -m benchmarks.run`.
+
+Settings are read when `src` is first imported, so the defaults below are applied before that:
+the fixture template tree is used and result caches are disabled to measure the full pipeline.
+"""
+
+import os
+from pathlib import Path
+
+os.environ.setdefault("TEMPLATES_DIR", str(Path(__file__).parent / "templates"))
+os.environ.setdefault("TEMPLATES_CHECK_INTERVAL", "0")
+os.environ.setdefault("RELEASE", "benchmark")
+os.environ.setdefault("ENVIRONMENTS", '["dev", "staging", "production"]')
+os.environ.setdefault("RENDER_CACHE_SIZE", "0")
+os.environ.setdefault("SECRETS_CACHE_SIZE", "0")
@@ -0,0 +1,87 @@
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from src.utils.encrypter import AesEncoder
+
+ENVIRONMENTS = ["dev", "staging", "production"]
+
+
+@dataclass(frozen=True)
+class Scale:
+    """Size of a synthetic repository config along every scaling axis."""
+
+    servers: int = 1
+    cronjobs: int = 1
+    consumers: int = 1
+    migrations: int = 1
+    envs: int = 10
+    secrets: int = 5
+    overrides: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return asdict(self)
+
+
+def per_env(value: str, overrides: int, override: str | None = None) -> str | dict[str, str]:
+    """Return `value` as is or as a per-environment mapping with `overrides` environments overridden."""
+    if not overrides:
+        return value
+    return {"_default": value} | {env: override or f"{value}-{env}" for env in ENVIRONMENTS[:overrides]}
+
+
+def make_envs(prefix: str, scale: Scale) -> dict[str, Any]:
+    return {f"{prefix}_VAR_{i}": per_env(f"{prefix.lower()}-value-{i}", scale.overrides) for i in range(scale.envs)}
+
+
+def make_config(scale: Scale, secret_key: bytes) -> dict[str, Any]:
+    encoder = AesEncoder(secret_key)
+    return {
+        "engine": {
+            "language": {"name": "python", "version": "3.12"},
+            "additional_system_packages": ["curl", "libpq-dev"],
+            "package_manager": {"name": "poetry", "version": "1.8.3"},
+        },
+        "envs": make_envs("GLOBAL", scale),
+        "secrets": {
+            "envs": {f"SECRET_{i}": encoder.encrypt(f"secret-value-{i}".encode()) for i in range(scale.secrets)},
+        },
+        "db_migrations": [
+            {"command": f"alembic upgrade head --tag {i}", "envs": make_envs(f"MIGRATION_{i}", scale)}
+            for i in range(scale.migrations)
+        ],
+        "servers": [
+            {
+                "name": f"server-{i}",
+                "command": f"gunicorn app.server_{i}:app",
+                "enabled": True,
+                "replicas": {"_default": 1, "production": 3} if scale.overrides else 2,
+                "memory_limits": "512Mi",
+                "requests": {"memory": "256Mi", "cpu": "100m"},
+                "envs": make_envs(f"SERVER_{i}", scale),
+            }
+            for i in range(scale.servers)
+        ],
+        "cronjobs": [
+            {
+                "name": f"cronjob-{i}",
+                "command": f"python -m app.jobs.job_{i}",
+                "enabled": True,
+                "schedule": per_env(f"{i % 60} * * * *", scale.overrides, f"{i % 60} */2 * * *"),
+                "concurrency": "forbid",
+                "envs": make_envs(f"CRONJOB_{i}", scale),
+            }
+            for i in range(scale.cronjobs)
+        ],
+        "consumers": [
+            {
+                "name": f"consumer-{i}",
+                "command": f"python -m app.consumers.consumer_{i}",
+                "enabled": True,
+                "replicas": 1,
+                "memory_limits": "256Mi",
+                "requests": {"memory": "128Mi", "cpu": "50m"},
+                "envs": make_envs(f"CONSUMER_{i}", scale),
+            }
+            for i in range(scale.consumers)
+        ],
+    }
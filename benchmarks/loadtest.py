@@ -0,0 +1,326 @@
+"""Load test of the HTTP app, run with `python -m benchmarks.loadtest`.
+
+The app is started with `src.launcher` on a free local port, or `--url` points at a running
+server. `--concurrency` clients then send requests in a closed loop for `--duration` seconds:
+`/manifests/generate`, `/dockerfiles/generate` and `/secrets/encrypt` in the proportions of
+`--mix`, built from a corpus of repository configs. Requests sent during the first `--warmup`
+seconds are not measured.
+
+The request sequence only depends on `--seed`, so runs with other worker counts or releases
+replay the same traffic. Throughput, error counts and p50/p95/p99 latencies are printed per
+endpoint and saved as JSON to compare runs.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import logging
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import httpx
+import orjson
+import yaml
+
+from src.config import settings
+from src.utils.encrypter import AesEncoder
+
+from .configs import ENVIRONMENTS, Scale, make_config
+from .run import RESULTS_DIR, git_commit
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# A mix of repository sizes as seen in CI, from a single service to a monolith.
+CORPUS_SCALES = {
+    "service": Scale(),
+    "api": Scale(servers=3, cronjobs=5, consumers=2, envs=30, secrets=10, overrides=2),
+    "workers": Scale(servers=1, consumers=15, envs=40, secrets=20, overrides=1),
+    "monolith": Scale(servers=20, cronjobs=20, consumers=20, migrations=5, envs=100, secrets=100, overrides=3),
+}
+
+TEAMS = ["backend", "frontend", "data", "platform"]
+
+ENDPOINTS = {
+    "manifests": "/manifests/generate",
+    "dockerfiles": "/dockerfiles/generate",
+    "secrets": "/secrets/encrypt",
+}
+
+DEFAULT_MIX = "manifests=8,dockerfiles=1,secrets=1"
+
+READY_TIMEOUT = 60.0
+
+SERVER_LOG = RESULTS_DIR / "loadtest-server.log"
+
+
+@dataclass(frozen=True, slots=True)
+class LoadRequest:
+    endpoint: str
+    headers: dict[str, str]
+    content: bytes
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    endpoint: str
+    status: int
+    latency: float
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for item in value.split(","):
+        endpoint, _, weight = item.partition("=")
+        if endpoint.strip() not in ENDPOINTS or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"Invalid mix `{item}`, expected <{'|'.join(ENDPOINTS)}>=<weight>")
+        mix[endpoint.strip()] = int(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("At least one endpoint needs a positive weight")
+    return mix
+
+
+def synthetic_corpus(secret_key: bytes) -> dict[str, dict[str, Any]]:
+    return {name: make_config(scale, secret_key) for name, scale in CORPUS_SCALES.items()}
+
+
+def load_corpus(directory: Path) -> dict[str, dict[str, Any]]:
+    """Repository configs from `*.yaml` files, named after the file."""
+    return {path.stem: yaml.safe_load(path.read_bytes()) for path in sorted(directory.glob("*.y*ml"))}
+
+
+def secret_envs(config: dict[str, Any]) -> dict[str, str | dict[str, str]]:
+    """The config's envs as a `/secrets/encrypt` body: what a team would encrypt before committing."""
+    envs = config.get("envs") or {"SECRET": "value"}
+    return {
+        key: {env: str(item) for env, item in value.items()} if isinstance(value, dict) else str(value)
+        for key, value in envs.items()
+    }
+
+
+def build_requests(
+        corpus: dict[str, dict[str, Any]], mix: dict[str, int], secret_key: str, count: int, seed: int,
+) -> list[LoadRequest]:
+    """Draw `count` requests from the corpus, the same ones for the same seed.
+
+    Every request has a commit of its own, like pipelines of consecutive commits, so
+    responses are rendered rather than served from the render cache.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    names = list(corpus)
+    bodies = {name: yaml.dump(config, Dumper=YamlDumper).encode() for name, config in corpus.items()}
+    endpoints, weights = zip(*mix.items(), strict=True)
+
+    requests = []
+    for _ in range(count):
+        endpoint = rng.choices(endpoints, weights)[0]
+        name = rng.choice(names)
+        if endpoint == "secrets":
+            body = {"envs": secret_envs(corpus[name]), "secret_key": secret_key or None}
+            requests.append(LoadRequest(endpoint, {"content-type": "application/json"}, orjson.dumps(body)))
+            continue
+        commit = rng.randbytes(20).hex()
+        headers = {
+            "x-image": f"registry.example.com/{name}:{commit[:8]}",
+            "x-project-id": str(names.index(name) + 1),
+            "x-project-name": name,
+            "x-current-env": rng.choice(ENVIRONMENTS),
+            "x-team": rng.choice(TEAMS),
+            "x-branch-name": "main",
+            "x-commit-hash": commit,
+            "x-secret-key": secret_key,
+            "content-type": "application/yaml",
+        }
+        requests.append(LoadRequest(endpoint, headers, bodies[name]))
+    return requests
+
+
+async def run_load(
+        client: httpx.AsyncClient, requests: Sequence[LoadRequest], concurrency: int, duration: float, warmup: float,
+) -> tuple[list[Sample], float]:
+    """Send `requests` in order, cycling, from `concurrency` clients; return the measured samples and time."""
+    plan: Iterator[LoadRequest] = itertools.cycle(requests)
+    samples: list[Sample] = []
+    started_at = time.perf_counter()
+    measured_from = started_at + warmup
+    ends_at = measured_from + duration
+
+    async def worker() -> None:
+        while (now := time.perf_counter()) < ends_at:
+            request = next(plan)
+            path = ENDPOINTS[request.endpoint]
+            try:
+                status = (await client.post(path, headers=request.headers, content=request.content)).status_code
+            except httpx.HTTPError:
+                status = 0
+            if now >= measured_from:
+                samples.append(Sample(request.endpoint, status, time.perf_counter() - now))
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return samples, time.perf_counter() - measured_from
+
+
+def percentile(latencies: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted `latencies`."""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> dict[str, Any]:
+    summary = {}
+    groups = {"all": list(samples)} | {
+        endpoint: [sample for sample in samples if sample.endpoint == endpoint] for endpoint in ENDPOINTS
+    }
+    for name, group in groups.items():
+        if not group:
+            continue
+        latencies = sorted(sample.latency for sample in group)
+        statuses = Counter(sample.status for sample in group)
+        summary[name] = {
+            "requests": len(group),
+            "errors": sum(count for status, count in statuses.items() if not 200 <= status < 400),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "throughput": len(group) / elapsed,
+            "mean": statistics.fmean(latencies),
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1],
+        }
+    return summary
+
+
+def print_summary(summary: dict[str, Any]) -> None:
+    header = f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}"
+    print(header, file=sys.stderr)  # noqa: T201
+    for name, result in summary.items():
+        print(  # noqa: T201
+            f"{name:<12} {result['requests']:>9} {result['errors']:>7} {result['throughput']:>9.1f} "
+            f"{result['p50'] * 1000:>9.1f} {result['p95'] * 1000:>9.1f} {result['p99'] * 1000:>9.1f}",
+            file=sys.stderr,
+        )
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port: int = sock.getsockname()[1]
+        return port
+
+
+def start_server(port: int, workers: int, templates: Path) -> subprocess.Popen:
+    """Start `src.launcher` in the background, logging to `SERVER_LOG`."""
+    env = os.environ | {
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "WORKERS": str(workers),
+        "TEMPLATES_DIR": str(templates),
+    }
+    SERVER_LOG.parent.mkdir(parents=True, exist_ok=True)
+    with SERVER_LOG.open("wb") as log:
+        return subprocess.Popen([sys.executable, "-m", "src.launcher"], env=env, stdout=log, stderr=log)
+
+
+async def wait_ready(client: httpx.AsyncClient, server: subprocess.Popen | None) -> None:
+    deadline = time.perf_counter() + READY_TIMEOUT
+    while time.perf_counter() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"Server exited with {server.returncode}, see {SERVER_LOG}")
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server was not ready within {READY_TIMEOUT}s")
+
+
+async def run(
+        args: argparse.Namespace, url: str, server: subprocess.Popen | None, requests: list[LoadRequest],
+) -> tuple[list[Sample], float]:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=args.timeout) as client:
+        await wait_ready(client, server)
+        return await run_load(client, requests, args.concurrency, args.duration, args.warmup)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to load, a local one is started by default")
+    parser.add_argument("--workers", type=int, default=1, help="workers of the started server")
+    parser.add_argument("--templates", type=Path, default=TEMPLATES_DIR, help="templates of the started server")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients sending requests at once")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the measurement")
+    parser.add_argument("--timeout", type=float, default=30.0, help="request timeout in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help=f"endpoint weights, `{DEFAULT_MIX}`")
+    parser.add_argument("--corpus", type=Path, help="directory of repository configs, synthetic ones by default")
+    parser.add_argument("--secret-key", help="key the corpus secrets are encrypted with")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the request sequence")
+    parser.add_argument("--requests", type=int, default=1000, help="distinct requests, replayed in a cycle")
+    parser.add_argument("--output", type=Path, help="summary file, in benchmarks/results by default")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    if args.corpus is not None:
+        secret_key = args.secret_key or ""
+        corpus = load_corpus(args.corpus)
+    else:
+        secret_key = args.secret_key or AesEncoder.generate_key().decode()
+        corpus = synthetic_corpus(secret_key.encode())
+    requests = build_requests(corpus, args.mix, secret_key, args.requests, args.seed)
+
+    url, server = args.url, None
+    if url is None:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(port, args.workers, args.templates)
+    try:
+        samples, elapsed = asyncio.run(run(args, url, server, requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    summary = summarize(samples, elapsed)
+    print_summary(summary)
+    report = {
+        "meta": {
+            "release": settings.RELEASE,
+            "commit": git_commit(),
+            "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": url,
+            "workers": None if server is None else args.workers,
+            "concurrency": args.concurrency,
+            "duration": elapsed,
+            "warmup": args.warmup,
+            "mix": args.mix,
+            "corpus": sorted(corpus),
+            "seed": args.seed,
+        },
+        "results": summary,
+    }
+
+    workers = "external" if server is None else f"w{args.workers}"
+    output = args.output or RESULTS_DIR / f"loadtest-{settings.RELEASE}-{workers}-c{args.concurrency}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    print(f"Results saved to {output}", file=sys.stderr)  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import orjson
+import yaml
+from httpx import ASGITransport, AsyncClient
+
+from src.app import app
+from src.config import settings
+from src.core import Generator
+from src.types import ManifestGenerationRequest
+from src.utils.encrypter import AesEncoder
+
+from .configs import Scale, make_config
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+SCALES = {
+    "baseline": Scale(),
+    "servers": Scale(servers=50),
+    "cronjobs": Scale(cronjobs=50),
+    "consumers": Scale(consumers=50),
+    "migrations": Scale(migrations=20),
+    "envs": Scale(envs=500),
+    "secrets": Scale(secrets=500),
+    "overrides": Scale(envs=100, overrides=3),
+    "large": Scale(servers=20, cronjobs=20, consumers=20, migrations=5, envs=100, secrets=100, overrides=3),
+}
+
+METADATA = {
+    "image": "registry.example.com/benchmark:1a2b3c4d",
+    "project_id": "1",
+    "project_name": "benchmark",
+    "current_env": "production",
+    "team": "backend",
+    "branch_name": "main",
+    "commit": "1a2b3c4d5e6f",
+}
+
+Case = Callable[[], Awaitable[Any]]
+
+
+async def measure(case: Case, rounds: int, warmup: int) -> dict[str, float | int]:
+    for _ in range(warmup):
+        await case()
+    timings = []
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        await case()
+        timings.append(time.perf_counter() - started_at)
+    timings.sort()
+    return {
+        "rounds": rounds,
+        "min": timings[0],
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "p95": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def generator_case(payload: ManifestGenerationRequest, secret_key: bytes, method: str) -> Case:
+    async def case() -> Any:
+        generator = Generator(
+            payload,
+            image=METADATA["image"],
+            project_id=METADATA["project_id"],
+            project_name=METADATA["project_name"],
+            current_env=METADATA["current_env"],
+            team=METADATA["team"],
+            branch_name=METADATA["branch_name"],
+            commit=METADATA["commit"],
+            secret_key=secret_key.decode(),
+        )
+        return await getattr(generator, method)()
+
+    return case
+
+
+def encoder_case(secret_key: bytes, count: int, method: str) -> Case:
+    encoder = AesEncoder(secret_key)
+    values = [f"secret-value-{i}".encode() for i in range(count)]
+    encrypted = [encoder.encrypt(value).encode() for value in values]
+
+    async def case() -> Any:
+        if method == "encrypt":
+            return [encoder.encrypt(value) for value in values]
+        return encoder.decrypt_many(encrypted)
+
+    return case
+
+
+def asgi_case(client: AsyncClient, path: str, config: dict[str, Any], secret_key: bytes) -> Case:
+    body = yaml.safe_dump(config).encode()
+    headers = {
+        "x-image": METADATA["image"],
+        "x-project-id": METADATA["project_id"],
+        "x-project-name": METADATA["project_name"],
+        "x-current-env": METADATA["current_env"],
+        "x-team": METADATA["team"],
+        "x-branch-name": METADATA["branch_name"],
+        "x-commit-hash": METADATA["commit"],
+        "x-secret-key": secret_key.decode(),
+        "content-type": "application/yaml",
+    }
+
+    async def case() -> Any:
+        response = await client.post(path, content=body, headers=headers)
+        response.raise_for_status()
+        return response
+
+    return case
+
+
+def select(names: dict[str, Any], pattern: str | None) -> list[str]:
+    return [name for name in names if pattern is None or pattern in name]
+
+
+async def run(rounds: int, warmup: int, pattern: str | None) -> dict[str, Any]:
+    secret_key = AesEncoder.generate_key()
+    configs = {name: make_config(scale, secret_key) for name, scale in SCALES.items()}
+    payloads = {name: ManifestGenerationRequest(**config) for name, config in configs.items()}
+
+    results: dict[str, Any] = {}
+    transport = ASGITransport(app=app)  # type: ignore[arg-type]
+    async with AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        cases: dict[str, tuple[Case, dict[str, Any]]] = {}
+        for name, scale in SCALES.items():
+            cases[f"generate_manifests[{name}]"] = (
+                generator_case(payloads[name], secret_key, "generate_manifests"),
+                scale.as_dict(),
+            )
+        cases["generate_dockerfile"] = (generator_case(payloads["baseline"], secret_key, "generate_dockerfile"), {})
+        for count in (1, 100):
+            for method in ("encrypt", "decrypt"):
+                cases[f"aes_{method}[{count}]"] = (encoder_case(secret_key, count, method), {"values": count})
+        for name in ("baseline", "large"):
+            cases[f"asgi_manifests[{name}]"] = (
+                asgi_case(client, "/manifests/generate", configs[name], secret_key),
+                SCALES[name].as_dict(),
+            )
+        cases["asgi_dockerfile"] = (asgi_case(client, "/dockerfiles/generate", configs["baseline"], secret_key), {})
+
+        for name in select(cases, pattern):
+            case, parameters = cases[name]
+            results[name] = {"parameters": parameters} | await measure(case, rounds, warmup)
+            print(f"{name:<40} median {results[name]['median'] * 1000:9.3f} ms", file=sys.stderr)  # noqa: T201
+    return results
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Return the cases whose median got slower than the baseline by more than `threshold`."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = result["median"] / previous["median"]
+        marker = "REGRESSION" if ratio > 1 + threshold else ""
+        before, after = previous["median"] * 1000, result["median"] * 1000
+        print(f"{name:<40} {before:9.3f} ms -> {after:9.3f} ms  x{ratio:.2f} {marker}", file=sys.stderr)  # noqa: T201
+        if marker:
+            regressions.append(name)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the manifest generation pipeline.")
+    parser.add_argument("--rounds", type=int, default=50, help="measured runs per case")
+    parser.add_argument("--warmup", type=int, default=5, help="unmeasured runs per case")
+    parser.add_argument("-k", dest="pattern", help="only run cases whose name contains this string")
+    parser.add_argument("--output", type=Path, help="results file, benchmarks/results/<release>.json by default")
+    parser.add_argument("--compare", type=Path, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed median slowdown, 0.1 is 10%%")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    results = asyncio.run(run(args.rounds, args.warmup, args.pattern))
+    report = {
+        "meta": {
+            "release": settings.RELEASE,
+            "commit": git_commit(),
+            "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rounds": args.rounds,
+        },
+        "results": results,
+    }
+
+    output = args.output or RESULTS_DIR / f"{settings.RELEASE}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    print(f"Results saved to {output}", file=sys.stderr)  # noqa: T201
+
+    if args.compare is not None:
+        regressions = compare(results, orjson.loads(args.compare.read_bytes()), args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Import time profile of the server, run with `python -m benchmarks.startup`.
+
+The module is imported in a fresh interpreter with `-X importtime`, so the numbers are
+those of a cold pod start: self and cumulative time per module and self time summed per
+top-level package.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+
+# Importing `src.app` must stay under this many seconds, checked by `tests/test_startup.py`.
+IMPORT_TIME_BUDGET = 1.5
+
+# Imported on first use only, they must not be loaded by `src.app`.
+LAZY_MODULES = ("uvicorn", "croniter", "cryptography")
+
+IMPORT_TIME_PREFIX = "import time:"
+
+
+@dataclass(frozen=True, slots=True)
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def profile_imports(module: str = "src.app") -> list[ImportTime]:
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ.copy(),
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_us, cumulative_us, name = line.removeprefix(IMPORT_TIME_PREFIX).split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        imports.append(ImportTime(name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def total_seconds(imports: list[ImportTime]) -> float:
+    return sum(item.self_us for item in imports) / 1_000_000
+
+
+def package_times(imports: list[ImportTime]) -> dict[str, int]:
+    packages: defaultdict[str, int] = defaultdict(int)
+    for item in imports:
+        packages[item.module.split(".")[0]] += item.self_us
+    return dict(sorted(packages.items(), key=lambda package: package[1], reverse=True))
+
+
+def print_report(imports: list[ImportTime], top: int) -> None:
+    print(f"{len(imports)} modules imported in {total_seconds(imports):.3f}s\n")  # noqa: T201
+
+    print(f"{'package':<40} {'self, ms':>10}")  # noqa: T201
+    for package, self_us in list(package_times(imports).items())[:top]:
+        print(f"{package:<40} {self_us / 1000:>10.1f}")  # noqa: T201
+
+    print(f"\n{'module':<60} {'self, ms':>10} {'cumulative, ms':>15}")  # noqa: T201
+    for item in sorted(imports, key=lambda item: item.self_us, reverse=True)[:top]:
+        print(f"{item.module:<60} {item.self_us / 1000:>10.1f} {item.cumulative_us / 1000:>15.1f}")  # noqa: T201
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.app", help="module to import, `src.app` by default")
+    parser.add_argument("--top", type=int, default=20, help="how many packages and modules to list")
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET, help="fail above this many seconds")
+    args = parser.parse_args()
+
+    imports = profile_imports(args.module)
+    print_report(imports, args.top)
+    if total_seconds(imports) > args.budget:
+        print(f"\nImport time is over the {args.budget}s budget", file=sys.stderr)  # noqa: T201
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import asyncio
+import math
+import time
+from collections import Counter, deque
+from collections.abc import AsyncGenerator, AsyncIterator, Collection
+from contextlib import aclosing, asynccontextmanager, nullcontext
+
+from litestar.exceptions import HTTPException, ServiceUnavailableException, TooManyRequestsException
+
+from .config import settings
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT
+
+
+OTHER_TEAM = "other"
+
+
+class AdmissionController:
+    """Limits renders running at once, in total and per team.
+
+    A request runs right away when both limits allow it, otherwise it waits in its team's
+    queue. Freed slots go to the queued teams in turn, one request each, so a team sending
+    a burst of requests waits behind its own requests and not in front of everybody else's.
+
+    Requests are rejected without waiting when their team's queue is full (429) or when
+    all queues together are full (503), and with a 503 after `queue_timeout` seconds in a
+    queue. An in-flight limit of 0 disables that limit.
+
+    Metrics are labelled with the team only for `metric_teams`, any other team is counted
+    as `other`: the team comes from a request header and every label value is a series.
+    """
+
+    def __init__(
+            self,
+            max_in_flight: int,
+            queue_size: int,
+            team_max_in_flight: int,
+            team_queue_size: int,
+            queue_timeout: float,
+            metric_teams: Collection[str] = (),
+    ):
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.team_max_in_flight = team_max_in_flight
+        self.team_queue_size = team_queue_size
+        self.queue_timeout = queue_timeout
+        self.metric_teams = frozenset(metric_teams)
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._team_in_flight: Counter[str] = Counter()
+        # Teams are served in insertion order and moved to the end once served.
+        self._waiters: dict[str, deque[asyncio.Future[None]]] = {}
+
+    @property
+    def retry_after(self) -> str:
+        return str(max(1, math.ceil(self.queue_timeout)))
+
+    def _metric_team(self, team: str) -> str:
+        return team if team in self.metric_teams else OTHER_TEAM
+
+    def _has_slot(self) -> bool:
+        return not self.max_in_flight or self.in_flight < self.max_in_flight
+
+    def _team_has_slot(self, team: str) -> bool:
+        return not self.team_max_in_flight or self._team_in_flight[team] < self.team_max_in_flight
+
+    def _start(self, team: str) -> None:
+        self.in_flight += 1
+        self._team_in_flight[team] += 1
+        self.admitted += 1
+        ADMISSION_IN_FLIGHT.inc()
+
+    def _reject(self, team: str, reason: str, exception: type[HTTPException]) -> HTTPException:
+        self.rejected += 1
+        ADMISSION_REJECTED.labels(self._metric_team(team), reason).inc()
+        return exception(
+            detail=f"Too many renders in progress ({reason.replace('_', ' ')})",
+            headers={"retry-after": self.retry_after},
+        )
+
+    def _dequeue(self, team: str, future: "asyncio.Future[None]") -> None:
+        waiters = self._waiters.get(team)
+        if waiters is None or future not in waiters:
+            return
+        waiters.remove(future)
+        if not waiters:
+            del self._waiters[team]
+        self.queued -= 1
+        ADMISSION_QUEUED.labels(self._metric_team(team)).dec()
+
+    def _dispatch(self) -> None:
+        progressed = True
+        while progressed and self._waiters and self._has_slot():
+            progressed = False
+            for team in list(self._waiters):
+                if not self._has_slot():
+                    break
+                if not self._team_has_slot(team):
+                    continue
+                future = self._waiters[team][0]
+                self._dequeue(team, future)
+                progressed = True
+                if future.done():
+                    continue  # cancelled, its request cleans up after itself
+                self._start(team)
+                future.set_result(None)
+                # Moved behind the other queued teams.
+                if team in self._waiters:
+                    self._waiters[team] = self._waiters.pop(team)
+
+    async def acquire(self, team: str) -> None:
+        if team not in self._waiters and self._has_slot() and self._team_has_slot(team):
+            self._start(team)
+            return
+
+        if len(self._waiters.get(team, ())) >= self.team_queue_size:
+            raise self._reject(team, "team_queue_full", TooManyRequestsException)
+        if self.queued >= self.queue_size:
+            raise self._reject(team, "queue_full", ServiceUnavailableException)
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(team, deque()).append(future)
+        self.queued += 1
+        ADMISSION_QUEUED.labels(self._metric_team(team)).inc()
+        started_at = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await future
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The slot was granted just before the request went away.
+                self.release(team)
+            self._dequeue(team, future)
+            if isinstance(e, TimeoutError):
+                raise self._reject(team, "timeout", ServiceUnavailableException) from e
+            raise
+        finally:
+            ADMISSION_WAIT.observe(time.perf_counter() - started_at)
+
+    def release(self, team: str) -> None:
+        self.in_flight -= 1
+        self._team_in_flight[team] -= 1
+        if not self._team_in_flight[team]:
+            del self._team_in_flight[team]
+        ADMISSION_IN_FLIGHT.dec()
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, team: str) -> AsyncIterator[None]:
+        await self.acquire(team)
+        try:
+            yield
+        finally:
+            self.release(team)
+
+    async def release_after[T](self, team: str, items: AsyncIterator[T]) -> AsyncIterator[T]:
+        """Yield `items` of a request admitted with `acquire` and release its slot once they are sent."""
+        try:
+            async with aclosing(items) if isinstance(items, AsyncGenerator) else nullcontext(items):
+                async for item in items:
+                    yield item
+        finally:
+            self.release(team)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "teams_queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+render_admission = AdmissionController(
+    max_in_flight=settings.ADMISSION_MAX_IN_FLIGHT,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    team_max_in_flight=settings.ADMISSION_TEAM_MAX_IN_FLIGHT,
+    team_queue_size=settings.ADMISSION_TEAM_QUEUE_SIZE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    metric_teams=settings.ADMISSION_METRIC_TEAMS,
+)
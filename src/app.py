@@ -1,20 +1,35 @@
 import logging.config
+from importlib.util import find_spec
 from logging import getLogger
 
-import uvicorn
 from litestar import Litestar, MediaType, Request, Response
 from litestar.exceptions import ValidationException
+from litestar.config.compression import CompressionConfig
 from litestar.contrib.pydantic import PydanticPlugin
 from litestar.openapi.config import OpenAPIConfig
 from litestar.openapi.plugins import SwaggerRenderPlugin, JsonRenderPlugin
 from litestar.status_codes import HTTP_500_INTERNAL_SERVER_ERROR
+from litestar.contrib.prometheus import PrometheusController
+from src.config import settings
+from src.metrics import prometheus_config
 from src.routes.manifests import ManifestsController
 from src.routes.secrets import SecretsController
 from src.routes.system import SystemController
 from src.routes.dockerfiles import DockerfilesController
+from src.routes.templates import TemplatesController
+from src.routes.profiles import ProfilesController
+from src.profiling import profiling_middleware
+from src.render import renderer, warm_up
+from src.templates import template_index
 
 logger = getLogger(__name__)
 
+# Brotli is used when the optional `brotli` package is installed, gzip otherwise and for clients without `br`.
+compression_config = CompressionConfig(
+    backend="brotli" if find_spec("brotli") else "gzip",
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+)
+
 
 def validation_exception_handler(request: Request, exc: ValidationException) -> Response:
     return Response(
@@ -34,18 +49,31 @@ def plain_text_exception_handler(_: Request, exc: Exception) -> Response:
         media_type=MediaType.JSON,
         content={"message": detail},
         status_code=status_code,
+        headers=getattr(exc, "headers", None),
     )
 
 
 app = Litestar(
-    route_handlers=[SystemController, ManifestsController, SecretsController, DockerfilesController],
+    route_handlers=[
+        SystemController,
+        ManifestsController,
+        SecretsController,
+        DockerfilesController,
+        TemplatesController,
+        ProfilesController,
+        PrometheusController,
+    ],
+    middleware=[prometheus_config.middleware, profiling_middleware],
+    compression_config=compression_config,
     openapi_config=OpenAPIConfig(
         title="ManMan API",
         version="0.1.0",
         path="/docs",
         render_plugins=[SwaggerRenderPlugin(), JsonRenderPlugin()],
-    ),
+    ) if settings.OPENAPI_ENABLED else None,
     plugins=[PydanticPlugin(prefer_alias=True)],
+    on_startup=[template_index.ensure_built, template_index.start_watching, warm_up.start],
+    on_shutdown=[template_index.stop_watching, renderer.shutdown],
     exception_handlers={
         Exception: plain_text_exception_handler,
         ValidationException: validation_exception_handler,
@@ -53,6 +81,8 @@ app = Litestar(
 )
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="127.0.0.1", port=8000)
 else:
     uvicorn_logger = logging.getLogger("uvicorn.access")
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Iterable
+from typing import Any
+
+import orjson
+from litestar.exceptions import HTTPException
+from pydantic import ValidationError
+
+from .admission import render_admission
+from .core import MANIFESTS_SEPARATOR, Generator, resolve_manifest_templates
+from .exceptions import InvalidPayload
+from .templates import TemplateSnapshot
+from .types import BulkManifestsItem, ValidateManifestsItem
+from .utils.payload import load_item_config, read_body, validate_manifest_config, validate_manifest_request
+
+logger = logging.getLogger(__name__)
+
+
+async def read_lines(chunks: AsyncIterator[bytes], max_size: int) -> list[bytes]:
+    body = await read_body(chunks, max_size)
+    return [line for line in body.split(b"\n") if line.strip()]
+
+
+def error_result(e: Exception) -> dict[str, Any]:
+    if isinstance(e, InvalidPayload):
+        return {"status": 400, "error": e.extra}
+    if isinstance(e, ValidationError):
+        return {"status": 400, "error": e.errors()}
+    if isinstance(e, HTTPException):
+        return {"status": e.status_code, "error": e.detail}
+    return {"status": 500, "error": "Internal server error"}
+
+
+async def render_bulk_item(snapshot: TemplateSnapshot, line_number: int, line: bytes) -> dict[str, Any]:
+    result: dict[str, Any] = {"line": line_number, "id": None}
+    try:
+        item = BulkManifestsItem.model_validate_json(line)
+        result["id"] = item.id
+        payload = validate_manifest_request(load_item_config(item.config), item.secret_key)
+        # Rejected items get a 429 or 503 line of their own, the rest of the request goes on.
+        async with render_admission.admit(item.metadata.team):
+            manifests = await Generator(
+                payload=payload,
+                image=item.metadata.image,
+                project_id=str(item.metadata.project_id),
+                project_name=item.metadata.project_name,
+                current_env=item.metadata.current_env.value,
+                team=item.metadata.team,
+                branch_name=item.metadata.branch_name,
+                commit=item.metadata.commit,
+                secret_key=item.secret_key,
+                snapshot=snapshot,
+            ).generate_manifests()
+    except (InvalidPayload, ValidationError, HTTPException) as e:
+        return result | error_result(e)
+    except Exception as e:
+        logger.exception("Bulk render failed for line %s", line_number)
+        return result | error_result(e)
+    return {**result, "status": 201, "manifests": MANIFESTS_SEPARATOR.join(manifests)}
+
+
+def validate_bulk_item(snapshot: TemplateSnapshot, line_number: int, line: bytes) -> dict[str, Any]:
+    result: dict[str, Any] = {"line": line_number, "id": None}
+    try:
+        item = ValidateManifestsItem.model_validate_json(line)
+        result["id"] = item.id
+        payload = validate_manifest_config(load_item_config(item.config))
+        templates = resolve_manifest_templates(snapshot, payload, item.team)
+    except (InvalidPayload, ValidationError, HTTPException) as e:
+        return result | error_result(e)
+    except Exception as e:
+        logger.exception("Validation failed for line %s", line_number)
+        return result | error_result(e)
+    return {**result, "status": 200, "templates": templates}
+
+
+def validate_lines(snapshot: TemplateSnapshot, lines: Iterable[bytes]) -> list[dict[str, Any]]:
+    return [validate_bulk_item(snapshot, line_number, line) for line_number, line in enumerate(lines, start=1)]
+
+
+async def stream_bulk_results(
+    snapshot: TemplateSnapshot, lines: Iterable[bytes], concurrency: int
+) -> AsyncIterator[bytes]:
+    """Render NDJSON items and yield the results as NDJSON in completion order.
+
+    At most `concurrency` renders run at once and at most `concurrency` results wait to
+    be sent; when the consumer is slow, finished renders block and no new ones start.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    results: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue(maxsize=concurrency)
+
+    async def render(line_number: int, line: bytes) -> None:
+        try:
+            await results.put(await render_bulk_item(snapshot, line_number, line))
+        finally:
+            semaphore.release()
+
+    async def produce() -> None:
+        tasks: set[asyncio.Task] = set()
+        try:
+            for line_number, line in enumerate(lines, start=1):
+                await semaphore.acquire()
+                task = asyncio.create_task(render(line_number, line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await results.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (result := await results.get()) is not None:
+            yield orjson.dumps(result, default=str) + b"\n"
+        await producer
+    finally:
+        producer.cancel()
@@ -0,0 +1,260 @@
+"""Render manifests without the server: `python -m src.cli`.
+
+Every (repository, environment) pair is rendered in a pool of worker processes and
+written to `--output` as `<project>/<env>.yaml`, or with `--split` as one file per workload
+in `<project>/<env>/`. Configs come from a directory (one repository per `*.yaml`,
+`*.yml` or `*.json` file, named after the file) or from a YAML/JSON list of `RenderTarget`
+entries, whose `config` paths are relative to the list. Options fill in what entries omit.
+
+Each output is recorded in `.manman-state.json` with a key of everything it depends on:
+config, metadata, templates version and release. Outputs whose key did not change are
+skipped, so a re-run only renders what changed.
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+import orjson
+import yaml
+from litestar.exceptions import HTTPException
+from pydantic import ValidationError
+
+from .config import settings
+from .core import MANIFESTS_SEPARATOR, Generator, render_cache_key
+from .exceptions import InvalidPayload
+from .templates import SNAPSHOT_ERRORS, template_index
+from .types import EnvironmentsEnum, ManifestGenerationRequest, RenderTarget
+from .utils.archive import manifest_file_name
+from .utils.payload import load_config, load_json_config, validate_manifest_request
+
+logger = logging.getLogger(__name__)
+
+CONFIG_SUFFIXES = {".yaml", ".yml", ".json"}
+STATE_FILE_NAME = ".manman-state.json"
+
+
+def load_targets(source: Path, defaults: dict[str, Any]) -> list[RenderTarget]:
+    if source.is_dir():
+        return [
+            RenderTarget(**{"project_name": path.stem, **defaults, "config": path})
+            for path in sorted(source.iterdir())
+            if path.is_file() and path.suffix in CONFIG_SUFFIXES
+        ]
+    entries = yaml.safe_load(source.read_bytes())
+    if not isinstance(entries, list):
+        raise TypeError(f"{source} must contain a list of repositories")
+    targets = [RenderTarget(**{**defaults, **entry}) for entry in entries]
+    return [target.model_copy(update={"config": source.parent / target.config}) for target in targets]
+
+
+def load_payload(target: RenderTarget) -> ManifestGenerationRequest:
+    content = target.config.read_bytes()
+    data = load_json_config(content) if target.config.suffix == ".json" else load_config(content)
+    return validate_manifest_request(data, target.secret_key)
+
+
+def output_path(output: Path, target: RenderTarget, env: str, *, split: bool) -> Path:
+    return output / target.project_name / (env if split else f"{env}.yaml")
+
+
+def write_output(path: Path, manifests: list[tuple[str, str]], *, split: bool) -> None:
+    if not split:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(MANIFESTS_SEPARATOR.join(manifest for _, manifest in manifests))
+        return
+
+    path.mkdir(parents=True, exist_ok=True)
+    file_names = set()
+    for workload_id, manifest in manifests:
+        file_name = manifest_file_name(workload_id)
+        (path / file_name).write_text(manifest)
+        file_names.add(file_name)
+    # Workloads removed from the config must not linger in the GitOps repository.
+    for stale in path.glob("*.yaml"):
+        if stale.name not in file_names:
+            stale.unlink()
+
+
+@contextmanager
+def scoped_environ(**values: str) -> Iterator[None]:
+    """Set environment variables for the processes started meanwhile and restore them afterwards."""
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _init_worker(templates_root: str) -> None:
+    template_index.root = Path(templates_root)
+    template_index.snapshot.compile()
+
+
+def render_target(payload: ManifestGenerationRequest, target: RenderTarget, env: str) -> list[tuple[str, str]]:
+    async def render() -> list[tuple[str, str]]:
+        generator = Generator(
+            payload=payload,
+            image=target.image,
+            project_id=str(target.project_id),
+            project_name=target.project_name,
+            current_env=env,
+            team=target.team,
+            branch_name=target.branch_name,
+            commit=target.commit,
+            secret_key=target.secret_key,
+        )
+        return [(w.id, manifest) async for w, manifest in generator.iter_workload_manifests()]
+
+    return asyncio.run(render())
+
+
+def parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("source", type=Path, help="directory of repository configs or a list of repositories")
+    parser.add_argument("-o", "--output", type=Path, required=True, help="directory to write manifests to")
+    parser.add_argument(
+        "-e", "--env", dest="environments", action="append", choices=[env.value for env in EnvironmentsEnum],
+        help="environment to render, repeat for several, all by default",
+    )
+    parser.add_argument("--image", help="image of every repository")
+    parser.add_argument("--project-id", type=int, help="project id of every repository")
+    parser.add_argument("--team", help="team of every repository")
+    parser.add_argument("--branch-name", help="branch of every repository")
+    parser.add_argument("--commit", help="commit of every repository")
+    parser.add_argument(
+        "--secret-key", default=os.environ.get("MANMAN_SECRET_KEY"),
+        help="key to decrypt secrets, `MANMAN_SECRET_KEY` by default",
+    )
+    parser.add_argument("--templates", type=Path, default=settings.TEMPLATES_DIR, help="templates directory")
+    parser.add_argument("--split", action="store_true", help="write a file per workload")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of render processes")
+    parser.add_argument("--force", action="store_true", help="render everything, even unchanged outputs")
+    return parser.parse_args(argv)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderJob:
+    output_id: str
+    key: str
+    payload: ManifestGenerationRequest
+    target: RenderTarget
+    env: str
+
+
+def plan_jobs(
+        targets: list[RenderTarget], templates_version: str, state: dict[str, str], args: argparse.Namespace,
+) -> tuple[list[RenderJob], int, int]:
+    """Return the jobs whose output changed and the numbers of unchanged outputs and invalid configs."""
+    jobs = []
+    skipped = failed = 0
+    for target in targets:
+        try:
+            payload = load_payload(target)
+        except (OSError, InvalidPayload, ValidationError) as e:
+            logger.error("%s: %s", target.config, getattr(e, "extra", None) or e)  # noqa: TRY400
+            failed += 1
+            continue
+        for env in target.environments or list(EnvironmentsEnum):
+            output_id = f"{target.project_name}/{env.value}"
+            key = render_cache_key(
+                "cli",
+                payload,
+                templates_version,
+                **target.model_dump(mode="json", exclude={"config", "environments"}),
+                current_env=env.value,
+                split=str(args.split),
+            )
+            path = output_path(args.output, target, env.value, split=args.split)
+            if state.get(output_id) == key and path.exists():
+                skipped += 1
+                continue
+            state.pop(output_id, None)
+            jobs.append(RenderJob(output_id, key, payload, target, env.value))
+    return jobs, skipped, failed
+
+
+def run_jobs(jobs: list[RenderJob], state: dict[str, str], args: argparse.Namespace) -> tuple[int, int]:
+    """Render `jobs` in a process pool and write their outputs, returning the numbers of rendered and failed ones."""
+    rendered = failed = 0
+    # Workers render on their own event loop, a process pool inside them would only add overhead.
+    # Spawned workers read their settings when they import `src`, before any initializer runs.
+    with scoped_environ(RENDER_EXECUTOR="inline"), ProcessPoolExecutor(
+        max_workers=min(args.workers, len(jobs)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(str(args.templates),),
+    ) as executor:
+        futures = {executor.submit(render_target, job.payload, job.target, job.env): job for job in jobs}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                manifests = future.result()
+            except HTTPException as e:
+                logger.error("%s: %s", job.output_id, e.detail)  # noqa: TRY400
+                failed += 1
+                continue
+            except Exception:
+                logger.exception("%s: rendering failed", job.output_id)
+                failed += 1
+                continue
+            write_output(output_path(args.output, job.target, job.env, split=args.split), manifests, split=args.split)
+            state[job.output_id] = job.key
+            rendered += 1
+            logger.info("%s: %s manifests", job.output_id, len(manifests))
+    return rendered, failed
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    defaults = {
+        name: value
+        for name in ("image", "project_id", "team", "branch_name", "commit", "environments", "secret_key")
+        if (value := getattr(args, name)) is not None
+    }
+    try:
+        targets = load_targets(args.source, defaults)
+    except (OSError, TypeError, ValueError, yaml.YAMLError) as e:
+        logger.error("Failed to load repositories: %s", e)  # noqa: TRY400
+        return 2
+    try:
+        template_index.root = args.templates
+        templates_version = template_index.snapshot.version
+    except SNAPSHOT_ERRORS as e:
+        logger.error("Failed to load templates: %s", e)  # noqa: TRY400
+        return 2
+
+    state_path = args.output / STATE_FILE_NAME
+    state: dict[str, str] = {} if args.force or not state_path.exists() else orjson.loads(state_path.read_bytes())
+    jobs, skipped, failed = plan_jobs(targets, templates_version, state, args)
+    rendered = 0
+    if jobs:
+        rendered, render_failed = run_jobs(jobs, state, args)
+        failed += render_failed
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    state_path.write_bytes(orjson.dumps(state, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    logger.info("Rendered %s, unchanged %s, failed %s", rendered, skipped, failed)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    sys.exit(main())
@@ -1,10 +1,15 @@
+import os
+import tempfile
+from collections.abc import Mapping
 from pathlib import Path
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from typing import Any, Literal
+
+from jinja2 import BaseLoader, Environment, FileSystemBytecodeCache, pass_context, select_autoescape
+from jinja2.runtime import Context
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import orjson
 
 BASE_DIR = Path(__file__).parent.parent.resolve()
-TEMPLATES_DIR = BASE_DIR / "templates"
 
 
 class Settings(BaseSettings):
@@ -14,12 +19,123 @@ class Settings(BaseSettings):
 
     ENVIRONMENTS: list[str]
 
+    TEMPLATES_DIR: Path = BASE_DIR / "templates"
+    TEMPLATES_CHECK_INTERVAL: float = 5.0
+    TEMPLATES_BYTECODE_CACHE_DIR: Path | None = None
+
+    MAX_BODY_SIZE: int = 10 * 1024 * 1024
+
+    RENDER_CACHE_SIZE: int = 256
+    DOCKERFILE_CACHE_SIZE: int = 128
+
+    SECRETS_CACHE_SIZE: int = 0
+    SECRETS_CACHE_TTL: float = 300.0
+
+    RENDER_EXECUTOR: Literal["inline", "process"] = "inline"
+    RENDER_WORKERS: int = os.cpu_count() or 1
+    RENDER_QUEUE_SIZE: int = 256
+    RENDER_QUEUE_TIMEOUT: float = 10.0
+
+    HOST: str = "0.0.0.0"  # noqa: S104
+    PORT: int = 8000
+    WORKERS: int = 1
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"
+    GRACEFUL_TIMEOUT: float = 30.0
+
+    ADMISSION_MAX_IN_FLIGHT: int = 64
+    ADMISSION_QUEUE_SIZE: int = 256
+    ADMISSION_TEAM_MAX_IN_FLIGHT: int = 16
+    ADMISSION_TEAM_QUEUE_SIZE: int = 32
+    ADMISSION_QUEUE_TIMEOUT: float = 10.0
+    ADMISSION_METRIC_TEAMS: set[str] = set()
+
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+
+    OPENAPI_ENABLED: bool = True
+
+    PROFILING_ENABLED: bool = False
+    PROFILES_DIR: Path = Path(tempfile.gettempdir()) / "manman-profiles"
+    PROFILES_KEEP: int = 20
+
+    BULK_CONCURRENCY: int = 8
+    BULK_MAX_BODY_SIZE: int = 64 * 1024 * 1024
+
 
 settings = Settings()
 
-jinja_environment = Environment(
-    loader=FileSystemLoader(TEMPLATES_DIR),
-    enable_async=True,
-    autoescape=select_autoescape(),
-)
-jinja_environment.filters["jsonify"] = lambda x: orjson.dumps(x).decode()
+TEMPLATES_DIR = settings.TEMPLATES_DIR
+
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def jsonify(value: Any) -> str:
+    return orjson.dumps(value, default=json_default).decode()
+
+
+# Template variable holding the `JsonMemo` of the render, see `jsonify_filter`.
+JSON_MEMO_VARIABLE = "_json_memo"
+
+# Serialized directly: memoizing them costs more than `orjson.dumps`.
+JSON_SCALAR_TYPES = frozenset({str, int, float, bool, type(None)})
+
+
+class JsonMemo:
+    """`jsonify` output of the containers serialized in one request, keyed by identity.
+
+    Objects shared by every workload of a request, e.g. tolerations and affinity, are
+    serialized once instead of once per workload. Entries keep their object alive, so an
+    id is never reused by another object while the memo exists.
+    """
+
+    __slots__ = ("_items",)
+
+    def __init__(self) -> None:
+        self._items: dict[int, tuple[Any, str]] = {}
+
+    def dumps(self, value: Any) -> str:
+        if type(value) in JSON_SCALAR_TYPES:
+            return jsonify(value)
+        item = self._items.get(id(value))
+        if item is not None and item[0] is value:
+            return item[1]
+        serialized = jsonify(value)
+        self._items[id(value)] = (value, serialized)
+        return serialized
+
+
+@pass_context
+def jsonify_filter(context: Context, value: Any) -> str:
+    # Env values are scalars and make most calls, so they are serialized inline.
+    if type(value) in JSON_SCALAR_TYPES:
+        return orjson.dumps(value).decode()
+    memo: JsonMemo | None = context.get(JSON_MEMO_VARIABLE)
+    if memo is None:
+        return jsonify(value)
+    return memo.dumps(value)
+
+
+def create_jinja_environment(loader: BaseLoader, *, enable_async: bool = True) -> Environment:
+    bytecode_cache = None
+    if settings.TEMPLATES_BYTECODE_CACHE_DIR is not None:
+        settings.TEMPLATES_BYTECODE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(settings.TEMPLATES_BYTECODE_CACHE_DIR))
+
+    environment = Environment(
+        loader=loader,
+        enable_async=enable_async,
+        autoescape=select_autoescape(),
+        auto_reload=False,
+        cache_size=-1,
+        bytecode_cache=bytecode_cache,
+    )
+    environment.filters["jsonify"] = jsonify_filter
+    # Envs are passed as a `LayeredEnvs` mapping, the built-in `tojson` has to serialize it as well.
+    environment.policies["json.dumps_kwargs"] = {"default": json_default, "sort_keys": True}
+    return environment
+
@@ -1,19 +1,163 @@
 import asyncio
-import copy
+from collections.abc import AsyncGenerator, Iterator, Mapping
+from contextlib import aclosing
+from dataclasses import dataclass
 from typing import Any
 
-import yaml
 import logging
-from pathlib import Path
 from .exceptions import NoTemplateFound
 
-from .config import jinja_environment, settings, TEMPLATES_DIR
+from .config import JSON_MEMO_VARIABLE, JsonMemo, settings
+from .metrics import RENDERS, TEMPLATE_LOOKUPS, observe_stage
+from .render import renderer
+from .templates import TemplateSnapshot, template_index
 
-from .types import ManifestGenerationRequest
-from .utils.encrypter import AesEncoder
+from .types import Engine, ManifestGenerationRequest
+from .utils.cache import LRUCache, SingleFlight, TTLCache, make_cache_key
+from .utils.envs import LayeredEnvs
 
 logger = logging.getLogger(__name__)
 
+MANIFESTS_SEPARATOR = "\n---\n"
+
+render_cache: LRUCache[tuple[str, ...]] = LRUCache(settings.RENDER_CACHE_SIZE, name="render")
+dockerfile_cache: LRUCache[str] = LRUCache(settings.DOCKERFILE_CACHE_SIZE, name="dockerfile")
+template_index.subscribe(dockerfile_cache.clear)
+secrets_cache: TTLCache[bytes] = TTLCache(settings.SECRETS_CACHE_SIZE, settings.SECRETS_CACHE_TTL, name="secrets")
+
+# Identical concurrent requests, e.g. pipelines started by one merge, share one render.
+manifests_flights: SingleFlight[tuple[str, ...]] = SingleFlight("manifests")
+dockerfile_flights: SingleFlight[str] = SingleFlight("dockerfile")
+
+
+class RenderContext(Mapping[str, Any]):
+    """Immutable values shared by the workloads of one generation.
+
+    The values are serialized into `json_memo` once, so `jsonify` in templates reuses that
+    output for every workload instead of serializing e.g. tolerations again each time.
+    """
+
+    __slots__ = ("_values", "json_memo")
+
+    def __init__(self, **values: Any):
+        self._values = values
+        self.json_memo = JsonMemo()
+        for value in values.values():
+            self.json_memo.dumps(value)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._values)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+@dataclass(frozen=True, slots=True)
+class Workload:
+    """A manifest to render: `id` is stable across generations, e.g. `server/api`.
+
+    `context` holds the workload's own values, `shared` the ones common to the generation.
+    """
+
+    id: str
+    kind: str
+    template_path: str
+    context: dict[str, Any]
+    shared: RenderContext | None = None
+
+    def template_context(self) -> dict[str, Any]:
+        if self.shared is None:
+            return self.context
+        return {**self.shared, **self.context, JSON_MEMO_VARIABLE: self.shared.json_memo}
+
+
+def workload(
+        workload_id: str, kind: str, template_path: str, shared: RenderContext | None = None, /, **context: Any,
+) -> Workload:
+    return Workload(workload_id, kind, template_path, context, shared)
+
+
+def workload_hash(workload: Workload, templates_version: str) -> str:
+    """Hash everything the rendered manifest depends on, so equal hashes mean equal output."""
+    return make_cache_key(
+        settings.RELEASE,
+        templates_version,
+        workload.kind,
+        workload.template_path,
+        {**(workload.shared or {}), **workload.context},
+    )
+
+
+def render_cache_key(kind: str, payload: ManifestGenerationRequest, templates_version: str, **metadata: str) -> str:
+    return make_cache_key(
+        kind,
+        payload.model_dump(mode="json"),
+        metadata,
+        settings.RELEASE,
+        templates_version,
+    )
+
+
+def dockerfile_cache_key(team: str, template_path: str, engine: Engine, templates_version: str) -> str:
+    return make_cache_key(
+        "dockerfile",
+        team,
+        template_path,
+        engine.model_dump(mode="json"),
+        templates_version,
+    )
+
+
+async def render(
+        snapshot: TemplateSnapshot, kind: str, template_path: str, render_id: str, /, **context: Any,
+) -> str:
+    RENDERS.labels(kind).inc()
+    with observe_stage("render", render_id):
+        return await renderer.render(snapshot, template_path, **context)
+
+
+async def render_workload(snapshot: TemplateSnapshot, workload: Workload) -> str:
+    return await render(snapshot, workload.kind, workload.template_path, workload.id, **workload.template_context())
+
+
+async def render_dockerfile(snapshot: TemplateSnapshot, engine: Engine, template_path: str) -> str:
+    return await render(
+        snapshot,
+        "dockerfile",
+        template_path,
+        "dockerfile",
+        language=engine.language.name,
+        version=engine.language.version,
+        additional_system_packages=" ".join(engine.additional_system_packages),
+        package_manager=engine.package_manager.name,
+        package_manager_version=engine.package_manager.version,
+    )
+
+
+def get_template_path(snapshot: TemplateSnapshot, team: str, language: str, file_name: str) -> str:
+    with observe_stage("template_resolution"):
+        template_path = snapshot.resolve(team, language, file_name)
+    TEMPLATE_LOOKUPS.labels(file_name, "missing" if template_path is None else "found").inc()
+    if template_path is None:
+        raise NoTemplateFound(
+            status_code=400,
+            detail=f"No {file_name} template found for team `{team}` and engine `{language}`", )
+    return template_path
+
+
+def resolve_manifest_templates(
+    snapshot: TemplateSnapshot, payload: ManifestGenerationRequest, team: str
+) -> dict[str, str]:
+    """Resolve every template `Generator.generate_manifests` needs in any environment, without rendering."""
+    file_names = ["migration.yaml.jinja2", "server.yaml.jinja2", "cronjob.yaml.jinja2", "consumer.yaml.jinja2"]
+    if any(server.hpa is not None for server in payload.servers or []):
+        file_names.append("server_hpa.yaml.jinja2")
+    language = payload.engine.language.name.lower()
+    return {file_name: get_template_path(snapshot, team, language, file_name) for file_name in file_names}
+
 
 class Generator:
     def __init__(
@@ -27,6 +171,7 @@ class Generator:
             branch_name: str,
             commit: str,
             secret_key: str,
+            snapshot: TemplateSnapshot | None = None,
     ):
         self.payload = payload
         self.image = image
@@ -37,35 +182,35 @@ class Generator:
         self.branch_name = branch_name
         self.commit = commit
         self.secret_key = secret_key
+        # Everything below resolves and renders with one snapshot, even if templates are swapped meanwhile.
+        self.snapshot = snapshot or template_index.snapshot
 
         self.language = payload.engine.language.name.lower()
 
-        self.default_common_dir = Path("_default")
-        self._default_team_dir = Path(self.team) / "_default"
-        self.target_lang_dir = Path(self.team) / self.language
-
-        self._default_folders = [
-            self.default_common_dir,
-            self._default_team_dir,
-            self.target_lang_dir,
-        ]
-
         self.tolerations = self.get_tolerations()
         self.affinity = self.get_affinity()
-        self.environment_variables = self.get_current_envs(payload.envs or {})
+        self.render_context = RenderContext(
+            image=image,
+            project_name=project_name,
+            current_env=current_env,
+            tolerations=self.tolerations,
+            affinity=self.affinity,
+            manman_release=settings.RELEASE,
+            branch_name=branch_name,
+            commit=commit,
+            team=team,
+        )
+        self.global_envs = self.get_current_envs(payload.envs or {})
+        self.environment_variables = LayeredEnvs(self.global_envs)
 
     def get_template_path(self, file_name: str) -> str:
-        template_path = Path()
-        for folder in self._default_folders:
-            path = folder / file_name
-            full_path = TEMPLATES_DIR / path
-            if full_path.exists():
-                template_path = path
-        if template_path == Path():
-            raise NoTemplateFound(
-                status_code=400,
-                detail=f"No {file_name} template found for team `{self.team}` and engine `{self.language}`", )
-        return template_path.as_posix()
+        return get_template_path(self.snapshot, self.team, self.language, file_name)
+
+    def load_defaults(self, file_name: str) -> Any:
+        path = self.snapshot.resolve(self.team, self.language, file_name)
+        if path is None:
+            return {}
+        return self.snapshot.defaults[path]
 
     def get_current_envs(self, envs: dict) -> dict[str, Any]:
         flattened_envs = {}
@@ -74,22 +219,10 @@ class Generator:
         return flattened_envs
 
     def get_tolerations(self) -> Any:
-        default_tolerations = {}
-        for folder in self._default_folders:
-            tolerations_path = folder / "tolerations.yaml"
-            if tolerations_path.exists():
-                with tolerations_path.open() as f:
-                    default_tolerations = yaml.safe_load(f)
-        return self.get_value(default_tolerations)
+        return self.get_value(self.load_defaults("tolerations.yaml"))
 
     def get_affinity(self) -> Any:
-        default_affinity = {}
-        for folder in self._default_folders:
-            affinity_path = folder / "affinity.yaml"
-            if affinity_path.exists():
-                with affinity_path.open() as f:
-                    default_affinity = yaml.safe_load(f)
-        return self.get_value(default_affinity)
+        return self.get_value(self.load_defaults("affinity.yaml"))
 
     def get_value(self, d: dict | str | int | None) -> Any:
         if isinstance(d, dict):
@@ -103,96 +236,82 @@ class Generator:
             "COMMIT": self.commit,
         }
 
-    def add_secret_values(self) -> dict[str, str]:
+    def add_secret_values(self) -> LayeredEnvs:
         envs = {k: self.get_value(v) for k, v in self.predefined_envs.items()}
 
-        self.environment_variables.update(envs)
-        if self.payload.secrets:
-            encrypted_secrets = self.payload.secrets.envs or {}
-            for key, encrypted_value in encrypted_secrets.items():
-                encrypted_value_str = str(self.get_value(encrypted_value))
-                decrypted_value = AesEncoder(
-                    self.secret_key.encode(),
-                ).decrypt(encrypted_value_str.encode())
+        if self.payload.secrets and self.payload.secrets.envs:
+            # cryptography is imported by the first config with secrets, not at startup.
+            from .utils.encrypter import AesEncoder
 
-                self.environment_variables[key] = decrypted_value.decode()
+            encrypted_secrets = self.payload.secrets.envs
+            with observe_stage("secret_decryption"):
+                decrypted_values = AesEncoder(self.secret_key.encode()).decrypt_many(
+                    [str(self.get_value(value)).encode() for value in encrypted_secrets.values()],
+                    cache=secrets_cache,
+                )
+            for key, decrypted_value in zip(encrypted_secrets, decrypted_values, strict=True):
+                envs[key] = decrypted_value.decode()
+        self.environment_variables = LayeredEnvs(self.global_envs, envs)
         return self.environment_variables
 
-    def get_migration_manifest_task(self) -> list[Any]:
+    def get_migration_workloads(self) -> list[Workload]:
         migration_template_path = self.get_template_path("migration.yaml.jinja2")
-        migration_template = jinja_environment.get_template(
-            migration_template_path,
-        )
 
         migration_tasks = []
         db_migrations = self.payload.db_migrations or []
-        for migration in db_migrations:
-            migration_envs = copy.deepcopy(self.environment_variables)
-            migration_envs.update(self.get_current_envs(migration.envs or {}))
+        for index, migration in enumerate(db_migrations):
+            migration_envs = self.environment_variables.new_child(self.get_current_envs(migration.envs or {}))
             migration_tasks.append(
-                migration_template.render_async(
-                    image=self.image,
-                    project_name=self.project_name,
-                    current_env=self.current_env,
-                    tolerations=self.tolerations,
-                    affinity=self.affinity,
+                workload(
+                    f"migration/{index}",
+                    "migration",
+                    migration_template_path,
+                    self.render_context,
                     command=self.get_value(migration.command),
                     envs=migration_envs,
-                    manman_release=settings.RELEASE,
-                    branch_name=self.branch_name,
-                    commit=self.commit,
-                    team=self.team,
                 ),
             )
         return migration_tasks
 
-    def get_servers_manifest_task(self) -> list[Any]:
+    def get_servers_workloads(self) -> list[Workload]:
         deployment_template_path = self.get_template_path("server.yaml.jinja2")
-        deployment_template = jinja_environment.get_template(
-            deployment_template_path,
-        )
 
         servers_tasks = []
 
         servers = self.payload.servers or []
+        if any(server.hpa is not None and self.get_value(server.enabled) for server in servers):
+            server_hpa_template_path = self.get_template_path("server_hpa.yaml.jinja2")
 
         for server in servers:
-            server_envs = copy.deepcopy(self.environment_variables)
-            server_envs.update(self.get_current_envs(server.envs or {}))
+            server_envs = self.environment_variables.new_child(self.get_current_envs(server.envs or {}))
             is_hpa_enabled = server.hpa is not None
             is_server_enabled = self.get_value(server.enabled)
             if not is_server_enabled:
                 continue
             # server manifest
             servers_tasks.append(
-                deployment_template.render_async(
+                workload(
+                    f"server/{server.name}",
+                    "server",
+                    deployment_template_path,
+                    self.render_context,
                     name=server.name,
                     command=server.command,
-                    image=self.image,
                     replicas=self.get_value(server.replicas),
-                    project_name=self.project_name,
                     is_hpa_enabled=is_hpa_enabled,
-                    current_env=self.current_env,
-                    tolerations=self.tolerations,
-                    affinity=self.affinity,
                     envs=server_envs,
                     memory_limits=self.get_value(server.memory_limits),
                     memory_requests=self.get_value(server.requests.memory),
                     cpu_requests=self.get_value(server.requests.cpu),
-                    manman_release=settings.RELEASE,
-                    branch_name=self.branch_name,
-                    commit=self.commit,
-                    team=self.team,
                 ),
             )
             if is_hpa_enabled:
-                server_hpa_template_path = self.get_template_path("server_hpa.yaml.jinja2")
-                server_hpa_template = jinja_environment.get_template(
-                    server_hpa_template_path,
-                )
                 # hpa manifest
                 servers_tasks.append(
-                    server_hpa_template.render_async(
+                    workload(
+                        f"server_hpa/{server.name}",
+                        "server_hpa",
+                        server_hpa_template_path,
                         project_name=self.project_name,
                         min_replicas=self.get_value(server.hpa.min_replicas),
                         max_replicas=self.get_value(server.hpa.max_replicas),
@@ -203,13 +322,10 @@ class Generator:
                 )
         return servers_tasks
 
-    def get_cronjob_manifest_task(self) -> list[Any]:
+    def get_cronjob_workloads(self) -> list[Workload]:
         cronjob_manifests_tasks = []
 
         cronjob_template_path = self.get_template_path("cronjob.yaml.jinja2")
-        cronjob_template = jinja_environment.get_template(
-            cronjob_template_path,
-        )
 
         cronjobs = self.payload.cronjobs or []
         for cronjob in cronjobs:
@@ -217,35 +333,26 @@ class Generator:
             if not is_enabled:
                 continue
 
-            cronjob_envs = copy.deepcopy(self.environment_variables)
-            cronjob_envs.update(self.get_current_envs(cronjob.envs or {}))
+            cronjob_envs = self.environment_variables.new_child(self.get_current_envs(cronjob.envs or {}))
 
             cronjob_manifests_tasks.append(
-                cronjob_template.render_async(
-                    image=self.image,
-                    project_name=self.project_name,
-                    current_env=self.current_env,
-                    tolerations=self.tolerations,
-                    affinity=self.affinity,
+                workload(
+                    f"cronjob/{cronjob.name}",
+                    "cronjob",
+                    cronjob_template_path,
+                    self.render_context,
                     command=cronjob.command,
                     envs=cronjob_envs,
                     name=cronjob.name,
                     schedule=self.get_value(cronjob.schedule),
                     concurrency=cronjob.concurrency.value.upper(),
-                    manman_release=settings.RELEASE,
-                    branch_name=self.branch_name,
-                    commit=self.commit,
-                    team=self.team,
                 ),
             )
         return cronjob_manifests_tasks
 
-    def get_consumers_manifest_task(self) -> list[Any]:
+    def get_consumers_workloads(self) -> list[Workload]:
         consumer_manifest_tasks = []
         consumers_template_path = self.get_template_path("consumer.yaml.jinja2")
-        consumers_template = jinja_environment.get_template(
-            consumers_template_path,
-        )
 
         consumers = self.payload.consumers or []
         for consumer in consumers:
@@ -253,16 +360,14 @@ class Generator:
             if not is_enabled:
                 continue
 
-            worker_envs = copy.deepcopy(self.environment_variables)
-            worker_envs.update(self.get_current_envs(consumer.envs or {}))
+            worker_envs = self.environment_variables.new_child(self.get_current_envs(consumer.envs or {}))
 
             consumer_manifest_tasks.append(
-                consumers_template.render_async(
-                    image=self.image,
-                    project_name=self.project_name,
-                    current_env=self.current_env,
-                    tolerations=self.tolerations,
-                    affinity=self.affinity,
+                workload(
+                    f"consumer/{consumer.name}",
+                    "consumer",
+                    consumers_template_path,
+                    self.render_context,
                     envs=worker_envs,
                     name=consumer.name,
                     command=consumer.command,
@@ -270,36 +375,72 @@ class Generator:
                     memory_limits=self.get_value(consumer.memory_limits),
                     memory_requests=self.get_value(consumer.requests.memory),
                     cpu_requests=self.get_value(consumer.requests.cpu),
-                    manman_release=settings.RELEASE,
-                    branch_name=self.branch_name,
-                    commit=self.commit,
-                    team=self.team,
                 ),
             )
 
         return consumer_manifest_tasks
 
-    async def generate_manifests(self) -> list[str]:
+    def get_workloads(self) -> list[Workload]:
         self.add_secret_values()
-        manifest_tasks = []
+        workloads = []
+
+        workloads.extend(self.get_migration_workloads())
+        workloads.extend(self.get_servers_workloads())
+        workloads.extend(self.get_cronjob_workloads())
+        workloads.extend(self.get_consumers_workloads())
+        return workloads
 
-        manifest_tasks.extend(self.get_migration_manifest_task())
-        manifest_tasks.extend(self.get_servers_manifest_task())
-        manifest_tasks.extend(self.get_cronjob_manifest_task())
-        manifest_tasks.extend(self.get_consumers_manifest_task())
+    def get_manifest_tasks(self) -> list[Any]:
+        return [render_workload(self.snapshot, w) for w in self.get_workloads()]
 
-        res = await asyncio.gather(*manifest_tasks)  # type: ignore[call-overload]
+    async def generate_manifests(self) -> list[str]:
+        res = await asyncio.gather(*self.get_manifest_tasks())
         return list(res)
 
-    async def generate_dockerfile(self) -> str:
-        dockerfile_path = self.get_template_path("dockerfile.jinja2")
-        dockerfile_template = jinja_environment.get_template(dockerfile_path)
-        return await dockerfile_template.render_async(
-            language=self.payload.engine.language.name,
-            version=self.payload.engine.language.version,
-            additional_system_packages=" ".join(
-                self.payload.engine.additional_system_packages,
-            ),
-            package_manager=self.payload.engine.package_manager.name,
-            package_manager_version=self.payload.engine.package_manager.version,
+    async def iter_workload_manifests(
+            self, workloads: list[Workload] | None = None,
+    ) -> AsyncGenerator[tuple[Workload, str], None]:
+        """Render all manifests concurrently and yield them with their workload in `generate_manifests` order.
+
+        Pass `workloads` from `get_workloads` to resolve templates and decrypt secrets before
+        iterating, e.g. before a streamed response sends its status.
+        """
+        if workloads is None:
+            workloads = self.get_workloads()
+        tasks = [asyncio.ensure_future(render_workload(self.snapshot, w)) for w in workloads]
+        try:
+            for w, task in zip(workloads, tasks, strict=True):
+                yield w, await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def iter_manifests(self, workloads: list[Workload] | None = None) -> AsyncGenerator[str, None]:
+        async with aclosing(self.iter_workload_manifests(workloads)) as manifests:
+            async for _, manifest in manifests:
+                yield manifest
+
+    async def generate_changed_manifests(self, previous_hashes: Mapping[str, str]) -> dict[str, Any]:
+        """Render only the workloads whose hash differs from `previous_hashes`.
+
+        Workloads with a matching hash are listed as unchanged and not rendered, ids
+        in `previous_hashes` that are no longer generated are listed as removed.
+        """
+        workloads = self.get_workloads()
+        hashes = {w.id: workload_hash(w, self.snapshot.version) for w in workloads}
+        changed = [w for w in workloads if previous_hashes.get(w.id) != hashes[w.id]]
+        manifests = await asyncio.gather(
+            *[render_workload(self.snapshot, w) for w in changed],
         )
+        return {
+            "manifests": [
+                {"id": w.id, "hash": hashes[w.id], "manifest": manifest}
+                for w, manifest in zip(changed, manifests, strict=True)
+            ],
+            "unchanged": [w.id for w in workloads if previous_hashes.get(w.id) == hashes[w.id]],
+            "removed": [workload_id for workload_id in previous_hashes if workload_id not in hashes],
+            "hashes": hashes,
+        }
+
+    async def generate_dockerfile(self) -> str:
+        return await render_dockerfile(self.snapshot, self.payload.engine, self.get_template_path("dockerfile.jinja2"))
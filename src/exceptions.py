@@ -9,3 +9,13 @@ class NoTemplateFound(HTTPException):
 class ImproperConfig(HTTPException):
     status_code = 400
     detail = "Improper configuration"
+
+
+class InvalidPayload(HTTPException):
+    status_code = 400
+    detail = "Invalid payload"
+
+
+class PayloadTooLarge(HTTPException):
+    status_code = 413
+    detail = "Request body is too large"
@@ -0,0 +1,223 @@
+"""Pre-fork launcher: `python -m src.launcher`.
+
+The parent process imports the app, loads and compiles the templates snapshot and then
+forks `WORKERS` uvicorn workers that share the listening socket. Workers inherit the warm
+snapshot copy-on-write, so none of them pays the cold start on its own.
+
+Signals sent to the parent:
+- SIGTERM, SIGINT: stop workers gracefully and exit
+- SIGHUP: reload templates and replace workers one by one
+
+A worker that exits is replaced after a delay that doubles with every exit in the last
+`CRASH_WINDOW` seconds. After `CRASH_LIMIT` exits in that window the launcher stops and
+exits with status 1, so that a broken deploy fails instead of restarting workers forever.
+"""
+
+import gc
+import logging
+import os
+import queue
+import signal
+import sys
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from logging.handlers import QueueListener
+from typing import TYPE_CHECKING
+
+import uvicorn
+
+from src.app import app
+from src.config import settings
+from src.templates import SNAPSHOT_ERRORS, template_index
+
+if TYPE_CHECKING:
+    import socket
+    from types import FrameType
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.2
+CRASH_LIMIT = 5
+CRASH_WINDOW = 60.0
+
+
+def queue_listeners() -> set[QueueListener]:
+    loggers = [logging.getLogger(), *logging.Logger.manager.loggerDict.values()]
+    handlers = {handler for logger in loggers if isinstance(logger, logging.Logger) for handler in logger.handlers}
+    listeners = {getattr(handler, "listener", None) for handler in handlers}
+    return {listener for listener in listeners if isinstance(listener, QueueListener)}
+
+
+class Supervisor:
+    def __init__(self, config: uvicorn.Config, workers: int, graceful_timeout: float):
+        self.config = config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.socket: socket.socket | None = None
+        self.pids: set[int] = set()
+        self.should_exit = False
+        self.should_restart = False
+        self.exit_code = 0
+        self.crashes: deque[float] = deque()
+        self.respawns: list[float] = []
+        # Litestar logs through a queue served by a thread, and threads do not survive a fork.
+        self.listeners = queue_listeners()
+
+    def warm_up(self) -> None:
+        started_at = time.perf_counter()
+        template_index.build()
+        compiled = template_index.snapshot.compile()
+        # Move everything allocated so far out of the collector's reach, so that collections
+        # in workers do not write to (and copy) the pages shared with this process.
+        gc.freeze()
+        logger.info("Compiled %s templates in %.3fs before forking", compiled, time.perf_counter() - started_at)
+
+    @contextmanager
+    def listeners_paused(self) -> Iterator[None]:
+        """Stop log queue threads while forking, records logged meanwhile are emitted afterwards."""
+        for listener in self.listeners:
+            listener.stop()
+        try:
+            yield
+        finally:
+            for listener in self.listeners:
+                listener.start()
+
+    def spawn(self) -> None:
+        if self.socket is None:
+            raise RuntimeError("The listening socket is not bound")
+        sockets = [self.socket]
+        pid = os.fork()
+        if pid:
+            self.pids.add(pid)
+            return
+
+        for listener in self.listeners:
+            # Records queued by the parent before the fork are emitted by the parent.
+            if isinstance(listener.queue, queue.Queue):
+                with suppress(queue.Empty):
+                    while True:
+                        listener.queue.get_nowait()
+            listener.start()
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            uvicorn.Server(self.config).run(sockets=sockets)
+        except Exception:
+            logger.exception("Worker %s crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+
+    def wait_worker(self, pid: int, deadline: float) -> None:
+        while time.monotonic() < deadline:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                break
+            time.sleep(POLL_INTERVAL)
+        else:
+            logger.warning("Worker %s did not stop in %ss, killing it", pid, self.graceful_timeout)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.pids.discard(pid)
+
+    def stop_worker(self, pid: int) -> None:
+        os.kill(pid, signal.SIGTERM)
+        self.wait_worker(pid, time.monotonic() + self.graceful_timeout)
+
+    def restart(self) -> None:
+        self.should_restart = False
+        try:
+            template_index.reload()
+        except SNAPSHOT_ERRORS:
+            logger.exception("Failed to reload templates, keeping snapshot %s", template_index.snapshot.version)
+        gc.freeze()
+        with self.listeners_paused():
+            # A replacement is started before each worker is stopped, so capacity never drops.
+            for pid in list(self.pids):
+                self.spawn()
+                self.stop_worker(pid)
+        logger.info("Workers restarted with templates snapshot %s", template_index.snapshot.version)
+
+    def reap(self) -> None:
+        now = time.monotonic()
+        while self.pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+            self.pids.discard(pid)
+            self.crashes.append(now)
+            while self.crashes[0] < now - CRASH_WINDOW:
+                self.crashes.popleft()
+            exit_code = os.waitstatus_to_exitcode(status)
+            if len(self.crashes) >= CRASH_LIMIT:
+                logger.error(
+                    "Worker %s exited with status %s, %s exits in %ss, stopping", pid, exit_code, len(self.crashes),
+                    CRASH_WINDOW,
+                )
+                self.should_exit = True
+                self.exit_code = 1
+                return
+            delay = POLL_INTERVAL * 2 ** (len(self.crashes) - 1)
+            logger.warning("Worker %s exited with status %s, starting a new one in %.1fs", pid, exit_code, delay)
+            self.respawns.append(now + delay)
+
+        due = [at for at in self.respawns if at <= now]
+        if due:
+            self.respawns = [at for at in self.respawns if at > now]
+            with self.listeners_paused():
+                for _ in due:
+                    self.spawn()
+
+    def handle_exit(self, signum: int, _: "FrameType | None") -> None:
+        logger.info("Received %s, stopping workers", signal.Signals(signum).name)
+        self.should_exit = True
+
+    def handle_restart(self, signum: int, _: "FrameType | None") -> None:
+        logger.info("Received %s, restarting workers", signal.Signals(signum).name)
+        self.should_restart = True
+
+    def run(self) -> None:
+        self.socket = self.config.bind_socket()
+        signal.signal(signal.SIGTERM, self.handle_exit)
+        signal.signal(signal.SIGINT, self.handle_exit)
+        signal.signal(signal.SIGHUP, self.handle_restart)
+        self.warm_up()
+        with self.listeners_paused():
+            for _ in range(self.workers):
+                self.spawn()
+        logger.info("Started %s workers on %s:%s", self.workers, self.config.host, self.config.port)
+
+        while not self.should_exit:
+            if self.should_restart:
+                self.restart()
+            self.reap()
+            time.sleep(POLL_INTERVAL)
+
+        for pid in self.pids:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in list(self.pids):
+            self.wait_worker(pid, deadline)
+        self.socket.close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(asctime)s - %(name)s - %(message)s")
+    config = uvicorn.Config(
+        app,
+        host=settings.HOST,
+        port=settings.PORT,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_graceful_shutdown=int(settings.GRACEFUL_TIMEOUT),
+    )
+    supervisor = Supervisor(config, settings.WORKERS, settings.GRACEFUL_TIMEOUT)
+    supervisor.run()
+    sys.exit(supervisor.exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from litestar.contrib.prometheus import PrometheusConfig
+from prometheus_client import Counter, Gauge, Histogram
+
+from .profiling import record_stage
+
+prometheus_config = PrometheusConfig(
+    app_name="manman",
+    prefix="manman",
+    exclude=["/metrics", "/liveness", "/ready"],
+)
+
+STAGE_DURATION = Histogram(
+    "manman_stage_duration_seconds",
+    "Time spent in a stage of the generation pipeline",
+    ["stage"],
+)
+CACHE_REQUESTS = Counter(
+    "manman_cache_requests_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+)
+TEMPLATE_LOOKUPS = Counter(
+    "manman_template_lookups_total",
+    "Template resolutions by file name and result",
+    ["file_name", "result"],
+)
+COALESCED_REQUESTS = Counter(
+    "manman_coalesced_requests_total",
+    "Requests that rendered (leader) or awaited an identical in-flight render (follower)",
+    ["flight", "role"],
+)
+ADMISSION_IN_FLIGHT = Gauge(
+    "manman_admission_in_flight",
+    "Renders admitted and running",
+)
+ADMISSION_QUEUED = Gauge(
+    "manman_admission_queued",
+    "Requests waiting for a render slot by team, `other` for teams not in `ADMISSION_METRIC_TEAMS`",
+    ["team"],
+)
+ADMISSION_WAIT = Histogram(
+    "manman_admission_wait_seconds",
+    "Time requests waited for a render slot",
+)
+ADMISSION_REJECTED = Counter(
+    "manman_admission_rejected_total",
+    "Requests rejected by admission control by team, `other` for teams not in `ADMISSION_METRIC_TEAMS`, and reason",
+    ["team", "reason"],
+)
+RENDERS = Counter(
+    "manman_renders_total",
+    "Rendered templates by workload kind",
+    ["kind"],
+)
+
+
+@contextmanager
+def observe_stage(stage: str, detail: str | None = None) -> Iterator[None]:
+    """Time a stage for the histogram and, when the request asked for them, its `Server-Timing` header.
+
+    `detail` tells apart timings of one stage within a request, e.g. the workload rendered.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started_at
+        STAGE_DURATION.labels(stage).observe(duration)
+        record_stage(stage, duration, detail)
@@ -0,0 +1,160 @@
+"""Opt-in profiling of single requests, enabled with `PROFILING_ENABLED`.
+
+A request sent with `x-manman-profile: timing` gets a `Server-Timing` header with the
+duration of every pipeline stage, one `render` entry per workload. With
+`x-manman-profile: cprofile` the request is also run under `cProfile`; the response
+carries `x-manman-profile-id` and the stats are stored in `PROFILES_DIR` for download
+from `/profiles/{id}`.
+"""
+
+import asyncio
+import cProfile
+import re
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import nullcontext
+from contextvars import ContextVar
+from pathlib import Path
+
+from litestar.datastructures import MutableScopeHeaders
+from litestar.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+
+PROFILE_HEADER = "x-manman-profile"
+PROFILE_ID_HEADER = "x-manman-profile-id"
+SERVER_TIMING_HEADER = "server-timing"
+
+TIMING_LEVEL = "timing"
+CPROFILE_LEVEL = "cprofile"
+PROFILE_LEVELS = {TIMING_LEVEL, CPROFILE_LEVEL}
+
+PROFILE_SUFFIX = ".pstats"
+PROFILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class StageTimings:
+    """Stage durations of one request, summed per stage and detail in the order stages first ran."""
+
+    __slots__ = ("_durations", "profiling")
+
+    def __init__(self, *, profiling: bool = False):
+        self._durations: dict[tuple[str, str | None], float] = {}
+        self.profiling = profiling
+
+    def add(self, stage: str, seconds: float, detail: str | None = None) -> None:
+        key = (stage, detail)
+        self._durations[key] = self._durations.get(key, 0.0) + seconds
+
+    def __iter__(self) -> Iterator[tuple[str, str | None, float]]:
+        for (stage, detail), seconds in self._durations.items():
+            yield stage, detail, seconds
+
+    def server_timing(self, total: float) -> str:
+        entries = []
+        for stage, detail, seconds in self:
+            description = "" if detail is None else f';desc="{detail}"'
+            entries.append(f"{stage}{description};dur={seconds * 1000:.3f}")
+        entries.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(entries)
+
+
+_timings: ContextVar[StageTimings | None] = ContextVar("stage_timings", default=None)
+
+# Only one profiler can be active in a process, profiled requests run one at a time.
+_profile_lock = asyncio.Lock()
+
+
+def record_stage(stage: str, seconds: float, detail: str | None = None) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(stage, seconds, detail)
+
+
+def is_timed() -> bool:
+    return _timings.get() is not None
+
+
+def is_profiling() -> bool:
+    timings = _timings.get()
+    return timings is not None and timings.profiling
+
+
+def profile_path(profile_id: str) -> Path | None:
+    if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+        return None
+    return settings.PROFILES_DIR / f"{profile_id}{PROFILE_SUFFIX}"
+
+
+def list_profiles() -> list[Path]:
+    """Stored profiles, newest first."""
+    if not settings.PROFILES_DIR.is_dir():
+        return []
+    paths = settings.PROFILES_DIR.glob(f"*{PROFILE_SUFFIX}")
+    return sorted(paths, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def save_profile(profiler: cProfile.Profile, profile_id: str) -> None:
+    settings.PROFILES_DIR.mkdir(parents=True, exist_ok=True)
+    profiler.dump_stats(settings.PROFILES_DIR / f"{profile_id}{PROFILE_SUFFIX}")
+    for stale in list_profiles()[settings.PROFILES_KEEP:]:
+        stale.unlink(missing_ok=True)
+
+
+def requested_level(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name.decode("latin-1").lower() == PROFILE_HEADER:
+            level = value.decode("latin-1").strip().lower()
+            return level if level in PROFILE_LEVELS else None
+    return None
+
+
+def profiling_middleware(app: ASGIApp) -> ASGIApp:
+    """Collect stage timings of requests asking for them and profile those asking for `cprofile`.
+
+    Headers are added when the response starts, so a streamed response only reports the
+    stages that ran before its first chunk. The profiler sees everything the event loop
+    runs meanwhile, other requests included, but not renders in worker processes or threads.
+    """
+
+    async def middleware(scope: Scope, receive: Receive, send: Send) -> None:
+        level = requested_level(scope) if scope["type"] == "http" and settings.PROFILING_ENABLED else None
+        if level is None:
+            await app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex if level == CPROFILE_LEVEL else None
+        profiler = cProfile.Profile() if profile_id else None
+        async with _profile_lock if profiler else nullcontext():
+            timings = StageTimings(profiling=profiler is not None)
+            token = _timings.set(timings)
+            started_at = time.perf_counter()
+
+            async def finish_profile() -> None:
+                nonlocal profiler
+                if profiler is not None and profile_id is not None:
+                    finished, profiler = profiler, None
+                    finished.disable()
+                    await asyncio.to_thread(save_profile, finished, profile_id)
+
+            async def send_with_timings(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableScopeHeaders.from_message(message)
+                    headers.add(SERVER_TIMING_HEADER, timings.server_timing(time.perf_counter() - started_at))
+                    if profile_id:
+                        headers.add(PROFILE_ID_HEADER, profile_id)
+                elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                    # Stored before the response completes, so the client can download it right away.
+                    await finish_profile()
+                await send(message)
+
+            try:
+                if profiler is not None:
+                    profiler.enable()
+                await app(scope, receive, send_with_timings)
+            finally:
+                _timings.reset(token)
+                await finish_profile()
+
+    return middleware
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Any, Protocol
+
+from jinja2 import DictLoader, Environment
+from litestar.exceptions import ServiceUnavailableException
+
+from .config import JSON_MEMO_VARIABLE, create_jinja_environment, settings
+from .profiling import is_profiling
+from .templates import TemplateIndex, TemplateSnapshot, compile_templates, template_index
+
+logger = logging.getLogger(__name__)
+
+
+class Renderer(Protocol):
+    async def render(self, snapshot: TemplateSnapshot, template_path: str, /, **context: Any) -> str: ...
+
+    def warm_up(self) -> None: ...
+
+    def reload(self) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class InlineRenderer:
+    """Renders on the event loop with the async jinja environment of the snapshot."""
+
+    def __init__(self, templates: TemplateIndex):
+        self.templates = templates
+
+    async def render(self, snapshot: TemplateSnapshot, template_path: str, /, **context: Any) -> str:
+        return await snapshot.environment.get_template(template_path).render_async(**context)
+
+    def warm_up(self) -> None:
+        self.templates.snapshot.compile()
+
+    def reload(self) -> None:
+        # Every snapshot has an environment of its own and is compiled before it is swapped in.
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+
+_worker_environment: Environment | None = None
+
+
+def _init_worker(sources: dict[str, str]) -> None:
+    global _worker_environment  # noqa: PLW0603
+    _worker_environment = create_jinja_environment(DictLoader(sources), enable_async=False)
+    compile_templates(_worker_environment)
+
+
+def _ping() -> None:
+    return None
+
+
+def worker_context(context: dict[str, Any]) -> dict[str, Any]:
+    """The context of a render submitted to the pool, without the request's `JsonMemo`.
+
+    The memo is keyed by object identity, which does not survive pickling, and each task is
+    pickled on its own, so in a worker it would only add to the task's size.
+    """
+    return {name: value for name, value in context.items() if name != JSON_MEMO_VARIABLE}
+
+
+def _render_in_worker(template_path: str, context: dict[str, Any]) -> str:
+    if _worker_environment is None:
+        raise RuntimeError("Render worker is not initialized")
+    return _worker_environment.get_template(template_path).render(**context)
+
+
+class PoolRenderer:
+    """Renders in a pool of worker processes with the current snapshot preloaded.
+
+    At most `queue_size` renders are submitted or running at once. Callers beyond that
+    wait for a free slot and get a 503 after `queue_timeout` seconds. Requests pinned to
+    a snapshot other than the one the pool was started with, and profiled requests,
+    render on the event loop.
+    """
+
+    def __init__(self, templates: TemplateIndex, workers: int, queue_size: int, queue_timeout: float):
+        self.templates = templates
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self._executor: ProcessPoolExecutor | None = None
+        self._version = ""
+        self._slots: asyncio.Semaphore | None = None
+
+    def _create_executor(self, snapshot: TemplateSnapshot) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(dict(snapshot.sources),),
+        )
+
+    def _spawn_workers(self, executor: ProcessPoolExecutor) -> None:
+        # Spawn every worker up front so that templates are loaded before the first request.
+        wait([executor.submit(_ping) for _ in range(self.workers)])
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            snapshot = self.templates.snapshot
+            self._executor = self._create_executor(snapshot)
+            self._version = snapshot.version
+        return self._executor
+
+    def warm_up(self) -> None:
+        self._spawn_workers(self._get_executor())
+
+    def reload(self) -> None:
+        """Start a pool with the new snapshot and swap it in once its workers are up.
+
+        Called from the templates watcher thread, so the event loop does not wait for the
+        workers to spawn. Until the swap, renders of the new snapshot run on the event loop.
+        Renders already submitted to the old pool still complete.
+        """
+        if self._executor is None:
+            return  # not started yet, it starts with the current snapshot
+        snapshot = self.templates.snapshot
+        executor = self._create_executor(snapshot)
+        self._spawn_workers(executor)
+        previous, self._executor = self._executor, executor
+        self._version = snapshot.version
+        previous.shutdown(wait=False)
+
+    async def render(self, snapshot: TemplateSnapshot, template_path: str, /, **context: Any) -> str:
+        # A profiled request renders on the event loop, where the profiler sees the templates run.
+        if is_profiling() or (self._executor is not None and snapshot.version != self._version):
+            return await snapshot.environment.get_template(template_path).render_async(**context)
+        executor = self._get_executor()
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_size)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except TimeoutError as e:
+            raise ServiceUnavailableException(
+                detail="Render queue is full", headers={"retry-after": str(int(self.queue_timeout))}
+            ) from e
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, _render_in_worker, template_path, worker_context(context))
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def create_renderer(executor: str) -> Renderer:
+    if executor == "process":
+        return PoolRenderer(
+            template_index,
+            workers=settings.RENDER_WORKERS,
+            queue_size=settings.RENDER_QUEUE_SIZE,
+            queue_timeout=settings.RENDER_QUEUE_TIMEOUT,
+        )
+    return InlineRenderer(template_index)
+
+
+class WarmUp:
+    """Compiles templates in a background thread after startup.
+
+    The app reports not-ready while warm-up runs. When startup hooks never ran there is
+    nothing to wait for and templates are compiled on first use.
+    """
+
+    def __init__(self, renderer: Renderer):
+        self.renderer = renderer
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._task is None or self._task.done()
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        started_at = time.perf_counter()
+        try:
+            await asyncio.to_thread(self.renderer.warm_up)
+        except Exception:
+            logger.exception("Templates warm-up failed")
+            return
+        logger.info("Templates warmed up in %.3fs", time.perf_counter() - started_at)
+
+
+renderer = create_renderer(settings.RENDER_EXECUTOR)
+template_index.subscribe(renderer.reload)
+warm_up = WarmUp(renderer)
@@ -1,12 +1,14 @@
-import yaml
-from litestar import Controller, HttpMethod, Response, route
-from litestar.enums import RequestEncodingType
-from litestar.params import Body, Parameter
-from litestar.datastructures import UploadFile
-from src.types import ManifestGenerationRequest, EnvironmentsEnum, DockerfileGenerationRequest
-from src.core import Generator
+from litestar import Controller, HttpMethod, Request, Response, route
+from litestar.params import Parameter
+from src.admission import render_admission
+from src.exceptions import InvalidPayload
+from src.types import EnvironmentsEnum
+from src.core import dockerfile_cache, dockerfile_cache_key, dockerfile_flights, get_template_path, render_dockerfile
+from src.templates import TEMPLATES_VERSION_HEADER, template_index
+from src.utils.cache import etag_matches, weak_etag
+from src.config import settings
+from src.utils.payload import read_config, validate_dockerfile_request
 from typing import Annotated
-from pydantic import ValidationError
 
 
 class DockerfilesController(Controller):
@@ -19,30 +21,38 @@ class DockerfilesController(Controller):
             team: Annotated[str, Parameter(header="x-team")],
             branch_name: Annotated[str, Parameter(header="x-branch-name")],
             commit: Annotated[str, Parameter(header="x-commit-hash")],
-            data: Annotated[UploadFile, Body(media_type=RequestEncodingType.MULTI_PART)],
+            request: Request,
+            if_none_match: Annotated[str | None, Parameter(header="if-none-match", default=None)],
     ) -> Response:
-        content = await data.read()
         try:
-            data = yaml.safe_load(content)
-        except yaml.YAMLError as e:
-            return Response(status_code=400, content={"error": str(e)})
-        try:
-            data = ManifestGenerationRequest(engine=DockerfileGenerationRequest(**(data or {})).engine)
-        except ValidationError as e:
-            return Response(status_code=400, content=e.errors())
+            payload = validate_dockerfile_request(await read_config(request, settings.MAX_BODY_SIZE))
+        except InvalidPayload as e:
+            return Response(status_code=400, content=e.extra)
+
+        # A dockerfile only depends on the team and the engine, so repositories sharing them
+        # share a cache entry and the project headers are not part of the key.
+        snapshot = template_index.snapshot
+        template_path = get_template_path(snapshot, team, payload.engine.language.name.lower(), "dockerfile.jinja2")
+        cache_key = dockerfile_cache_key(team, template_path, payload.engine, snapshot.version)
+        headers = {
+            "content-type": "text/plain",
+            "etag": weak_etag(cache_key),
+            TEMPLATES_VERSION_HEADER: snapshot.version,
+        }
+        if etag_matches(if_none_match, headers["etag"]):
+            return Response(status_code=304, content=b"", headers=headers)
+
+        async def render() -> str:
+            async with render_admission.admit(team):
+                dockerfile = await render_dockerfile(snapshot, payload.engine, template_path)
+            dockerfile_cache.set(cache_key, dockerfile)
+            return dockerfile
 
-        dockerfile = await Generator(
-            image="",
-            payload=data,
-            project_id=project_id,
-            project_name=project_name,
-            current_env=current_env,
-            team=team,
-            branch_name=branch_name,
-            commit=commit,
-        ).generate_dockerfile()
+        dockerfile = dockerfile_cache.get(cache_key)
+        if dockerfile is None:
+            dockerfile = await dockerfile_flights.run(cache_key, render)
         return Response(
             status_code=201,
             content=dockerfile,
-            headers={"content-type": "text/plain"},
+            headers=headers,
         )
@@ -1,12 +1,66 @@
-from typing import Annotated
-from litestar import Controller, HttpMethod, Response, route
-from litestar.enums import RequestEncodingType
-from litestar.params import Body, Parameter
-from litestar.datastructures import UploadFile
-from src.types import ManifestGenerationRequest, EnvironmentsEnum
-from src.core import Generator
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Annotated, Literal
+from litestar import Controller, HttpMethod, Request, Response, route
+from litestar.response import Stream
+from litestar.params import Parameter
 from pydantic import ValidationError
-import yaml
+from src.admission import render_admission
+from src.exceptions import InvalidPayload
+from src.metrics import observe_stage
+from src.profiling import is_timed
+from src.types import EnvironmentsEnum, IncrementalManifestsRequest
+from src.bulk import read_lines, stream_bulk_results, validate_lines
+from src.config import settings
+from src.core import MANIFESTS_SEPARATOR, Generator, Workload, manifests_flights, render_cache, render_cache_key
+from src.templates import TEMPLATES_VERSION_HEADER, template_index
+from src.utils.archive import ARCHIVE_MEDIA_TYPE, manifest_file_name, tar_stream
+from src.utils.cache import etag_matches, weak_etag
+from src.utils.payload import load_item_config, read_body, read_config, validate_manifest_request
+
+ALL_ENVIRONMENTS = "all"
+
+ARCHIVE_FORMAT = "tar"
+
+
+def parse_environments(value: str) -> list[str]:
+    if value.strip().lower() == ALL_ENVIRONMENTS:
+        return [env.value for env in EnvironmentsEnum]
+
+    environments = []
+    for env in value.split(","):
+        name = env.strip().lower()
+        if not name:
+            continue
+        if name not in EnvironmentsEnum.__members__:
+            raise InvalidPayload(extra={"error": f"Unknown environment `{name}`"})
+        if name not in environments:
+            environments.append(name)
+    if not environments:
+        raise InvalidPayload(extra={"error": "At least one environment is required."})
+    return environments
+
+
+async def join_manifests(manifests: AsyncIterator[str]) -> AsyncIterator[str]:
+    first = True
+    async for manifest in manifests:
+        if not first:
+            yield MANIFESTS_SEPARATOR
+        first = False
+        yield manifest
+
+
+async def cache_manifests(cache_key: str, manifests: AsyncIterator[str]) -> AsyncIterator[str]:
+    rendered = []
+    async for manifest in manifests:
+        rendered.append(manifest)
+        yield manifest
+    render_cache.set(cache_key, tuple(rendered))
+
+
+async def manifest_files(manifests: AsyncIterator[tuple[Workload, str]]) -> AsyncIterator[tuple[str, str]]:
+    async for w, manifest in manifests:
+        yield manifest_file_name(w.id), manifest
 
 
 class ManifestsController(Controller):
@@ -21,23 +75,171 @@ class ManifestsController(Controller):
             branch_name: Annotated[str, Parameter(header="x-branch-name")],
             commit: Annotated[str, Parameter(header="x-commit-hash")],
             secret_key: Annotated[str, Parameter(header="x-secret-key", default="")],
-            data: Annotated[UploadFile, Body(media_type=RequestEncodingType.MULTI_PART)]
+            request: Request,
+            stream: Annotated[bool, Parameter(query="stream", default=False)],
+            output_format: Annotated[Literal["yaml", "tar"], Parameter(query="format", default="yaml")],
+            if_none_match: Annotated[str | None, Parameter(header="if-none-match", default=None)],
+    ) -> Response | Stream:
+        try:
+            payload = validate_manifest_request(await read_config(request, settings.MAX_BODY_SIZE), secret_key)
+        except InvalidPayload as e:
+            return Response(status_code=400, content=e.extra)
+
+        archive = output_format == ARCHIVE_FORMAT
+        snapshot = template_index.snapshot
+        cache_key = render_cache_key(
+            "manifests_archive" if archive else "manifests",
+            payload,
+            snapshot.version,
+            image=image,
+            project_id=project_id,
+            project_name=project_name,
+            current_env=current_env.value,
+            team=team,
+            branch_name=branch_name,
+            commit=commit,
+            secret_key=secret_key,
+        )
+        headers = {
+            "content-type": ARCHIVE_MEDIA_TYPE if archive else "application/x-yaml",
+            # Weak: the bytes differ between gzip, brotli and identity encoded responses.
+            "etag": weak_etag(cache_key),
+            TEMPLATES_VERSION_HEADER: snapshot.version,
+        }
+        if archive:
+            headers["content-disposition"] = f'attachment; filename="{project_name}-{current_env.value}.tar"'
+        if etag_matches(if_none_match, headers["etag"]):
+            return Response(status_code=304, content=b"", headers=headers)
+
+        def create_generator() -> Generator:
+            return Generator(
+                payload=payload,
+                image=image,
+                project_id=project_id,
+                project_name=project_name,
+                current_env=current_env.value,
+                team=team,
+                branch_name=branch_name,
+                commit=commit,
+                secret_key=secret_key,
+                snapshot=snapshot,
+            )
+
+        async def render() -> tuple[str, ...]:
+            async with render_admission.admit(team):
+                manifests = tuple(await create_generator().generate_manifests())
+            render_cache.set(cache_key, manifests)
+            return manifests
+
+        # Archives are streamed straight from rendering, only the YAML bundle is cached.
+        if archive:
+            generator = create_generator()
+            workloads = generator.get_workloads()
+            await render_admission.acquire(team)
+            return Stream(
+                render_admission.release_after(
+                    team, tar_stream(manifest_files(generator.iter_workload_manifests(workloads))),
+                ),
+                status_code=201,
+                headers=headers,
+            )
+        # Timed requests always render on their own, otherwise there would be no stages to report.
+        timed = is_timed()
+        manifests = None if timed else render_cache.get(cache_key)
+        if manifests is None:
+            if stream:
+                # Config errors, e.g. a missing template or a wrong secret key, are raised here
+                # and get their status; only rendering happens after the response has started.
+                generator = create_generator()
+                workloads = generator.get_workloads()
+                await render_admission.acquire(team)
+                return Stream(
+                    render_admission.release_after(
+                        team, join_manifests(cache_manifests(cache_key, generator.iter_manifests(workloads))),
+                    ),
+                    status_code=201,
+                    headers=headers,
+                )
+            manifests = await (render() if timed else manifests_flights.run(cache_key, render))
+
+        with observe_stage("response_assembly"):
+            content = MANIFESTS_SEPARATOR.join(manifests)
+        return Response(
+            status_code=201,
+            content=content,
+            headers=headers,
+        )
+
+    @route(path="/manifests/generate/environments", http_method=HttpMethod.POST, tags=("Manifests generator",))
+    async def generate_environments_manifests(
+            self,
+            image: Annotated[str, Parameter(header="x-image")],
+            project_id: Annotated[str, Parameter(header="x-project-id")],
+            project_name: Annotated[str, Parameter(header="x-project-name")],
+            current_envs: Annotated[str, Parameter(header="x-current-env")],
+            team: Annotated[str, Parameter(header="x-team")],
+            branch_name: Annotated[str, Parameter(header="x-branch-name")],
+            commit: Annotated[str, Parameter(header="x-commit-hash")],
+            secret_key: Annotated[str, Parameter(header="x-secret-key", default="")],
+            request: Request,
     ) -> Response:
-        content = await data.read()
         try:
-            data = yaml.safe_load(content)
-        except yaml.YAMLError as e:
-            return Response(status_code=400, content={"error": str(e)})
+            environments = parse_environments(current_envs)
+            payload = validate_manifest_request(await read_config(request, settings.MAX_BODY_SIZE), secret_key)
+        except InvalidPayload as e:
+            return Response(status_code=400, content=e.extra)
 
+        snapshot = template_index.snapshot
+        async with render_admission.admit(team):
+            bundles = await asyncio.gather(*[
+                Generator(
+                    payload=payload,
+                    image=image,
+                    project_id=project_id,
+                    project_name=project_name,
+                    current_env=env,
+                    team=team,
+                    branch_name=branch_name,
+                    commit=commit,
+                    secret_key=secret_key,
+                    snapshot=snapshot,
+                ).generate_manifests()
+                for env in environments
+            ])
+        return Response(
+            status_code=201,
+            content={
+                env: MANIFESTS_SEPARATOR.join(manifests)
+                for env, manifests in zip(environments, bundles, strict=True)
+            },
+            headers={TEMPLATES_VERSION_HEADER: snapshot.version},
+        )
+
+    @route(path="/manifests/generate/incremental", http_method=HttpMethod.POST, tags=("Manifests generator",))
+    async def generate_incremental_manifests(
+            self,
+            image: Annotated[str, Parameter(header="x-image")],
+            project_id: Annotated[str, Parameter(header="x-project-id")],
+            project_name: Annotated[str, Parameter(header="x-project-name")],
+            current_env: Annotated[EnvironmentsEnum, Parameter(header="x-current-env")],
+            team: Annotated[str, Parameter(header="x-team")],
+            branch_name: Annotated[str, Parameter(header="x-branch-name")],
+            commit: Annotated[str, Parameter(header="x-commit-hash")],
+            secret_key: Annotated[str, Parameter(header="x-secret-key", default="")],
+            request: Request,
+    ) -> Response:
         try:
-            data = ManifestGenerationRequest(**(data or {}))
-            if data.secrets and not secret_key:
-                return Response(status_code=400, content={"error": "Secret key header is required to decrypt secrets."})
+            body = IncrementalManifestsRequest.model_validate_json(
+                await read_body(request.stream(), settings.MAX_BODY_SIZE),
+            )
+            payload = validate_manifest_request(load_item_config(body.config), secret_key)
+        except InvalidPayload as e:
+            return Response(status_code=400, content=e.extra)
         except ValidationError as e:
             return Response(status_code=400, content=e.errors())
 
-        manifests = await Generator(
-            payload=data,
+        generator = Generator(
+            payload=payload,
             image=image,
             project_id=project_id,
             project_name=project_name,
@@ -46,10 +248,31 @@ class ManifestsController(Controller):
             branch_name=branch_name,
             commit=commit,
             secret_key=secret_key,
-        ).generate_manifests()
-        content = "\n---\n".join(manifests)
+        )
+        async with render_admission.admit(team):
+            result = await generator.generate_changed_manifests(body.hashes)
         return Response(
             status_code=201,
-            content=content,
-            headers={"content-type": "application/x-yaml"},
+            content=result,
+            headers={TEMPLATES_VERSION_HEADER: generator.snapshot.version},
         )
+
+    @route(path="/manifests/generate/bulk", http_method=HttpMethod.POST, tags=("Manifests generator",))
+    async def generate_bulk_manifests(self, request: Request) -> Stream:
+        # The body is read before streaming starts: once the response is being sent,
+        # litestar listens for client disconnects on the same `receive` channel.
+        lines = await read_lines(request.stream(), settings.BULK_MAX_BODY_SIZE)
+        snapshot = template_index.snapshot
+        return Stream(
+            stream_bulk_results(snapshot, lines, settings.BULK_CONCURRENCY),
+            status_code=200,
+            media_type="application/x-ndjson",
+            headers={TEMPLATES_VERSION_HEADER: snapshot.version},
+        )
+
+    @route(path="/manifests/validate", http_method=HttpMethod.POST, tags=("Manifests generator",))
+    async def validate_manifests(self, request: Request) -> Response:
+        lines = await read_lines(request.stream(), settings.BULK_MAX_BODY_SIZE)
+        snapshot = template_index.snapshot
+        results = await asyncio.to_thread(validate_lines, snapshot, lines)
+        return Response(status_code=200, content=results, headers={TEMPLATES_VERSION_HEADER: snapshot.version})
@@ -0,0 +1,52 @@
+import io
+import pstats
+from pathlib import Path
+from typing import Annotated, ClassVar, Literal
+
+from litestar import Controller, HttpMethod, Response, route
+from litestar.exceptions import NotFoundException
+from litestar.params import Parameter
+
+from src.config import settings
+from src.profiling import PROFILE_SUFFIX, list_profiles, profile_path
+
+
+def format_stats(path: Path, sort: str, limit: int) -> str:
+    output = io.StringIO()
+    pstats.Stats(str(path), stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+class ProfilesController(Controller):
+    """Download of the profiles of requests sent with `x-manman-profile: cprofile`."""
+
+    include_in_schema = True
+
+    tags: ClassVar = ["System"]  # type: ignore[misc]
+
+    @route(path="/profiles", http_method=HttpMethod.GET)
+    async def list_profiles(self) -> Response:
+        if not settings.PROFILING_ENABLED:
+            raise NotFoundException
+        return Response(status_code=200, content=[path.name.removesuffix(PROFILE_SUFFIX) for path in list_profiles()])
+
+    @route(path="/profiles/{profile_id:str}", http_method=HttpMethod.GET)
+    async def get_profile(
+            self,
+            profile_id: str,
+            output_format: Annotated[Literal["pstats", "text"], Parameter(query="format", default="pstats")],
+            sort: Annotated[Literal["cumulative", "tottime", "calls"], Parameter(query="sort", default="cumulative")],
+            limit: Annotated[int, Parameter(query="limit", default=50, ge=1)],
+    ) -> Response:
+        path = profile_path(profile_id) if settings.PROFILING_ENABLED else None
+        if path is None or not path.is_file():
+            raise NotFoundException(detail=f"No profile `{profile_id}`")
+
+        if output_format == "text":
+            return Response(status_code=200, content=format_stats(path, sort, limit), media_type="text/plain")
+        return Response(
+            status_code=200,
+            content=path.read_bytes(),
+            media_type="application/octet-stream",
+            headers={"content-disposition": f'attachment; filename="{path.name}"'},
+        )
@@ -3,12 +3,13 @@ import yaml
 from litestar import Controller, HttpMethod, Response, route
 from litestar.exceptions import HTTPException
 from src.types import SecretsEncryptRequest
-from src.utils.encrypter import AesEncoder
 
 
 class SecretsController(Controller):
     @route(path="/secrets/encrypt", http_method=HttpMethod.POST, tags=("Secrets",))
     async def encrypt_envs(self, data: SecretsEncryptRequest) -> Response:
+        from src.utils.encrypter import AesEncoder
+
         if not data.secret_key:
             secret_key = AesEncoder.generate_key()
         else:
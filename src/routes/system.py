@@ -2,6 +2,12 @@ from typing import ClassVar
 
 from litestar import Controller, HttpMethod, Response, route
 
+from src.admission import render_admission
+from src.core import dockerfile_cache, dockerfile_flights, manifests_flights, render_cache, secrets_cache
+from src.render import warm_up
+from src.types import is_valid_cpu, is_valid_memory, is_valid_schedule
+from src.utils.cache import lru_cache_stats
+
 
 class SystemController(Controller):
     """Controller for system endpoints."""
@@ -16,4 +22,25 @@ class SystemController(Controller):
 
     @route(path="/ready", http_method=HttpMethod.GET)
     async def readiness(self) -> Response:
+        if not warm_up.is_ready:
+            return Response(status_code=503, content="")
         return Response(status_code=200, content="")
+
+    @route(path="/cache", http_method=HttpMethod.GET)
+    async def cache_stats(self) -> Response:
+        return Response(
+            status_code=200,
+            content={
+                "render": render_cache.stats(),
+                "dockerfile": dockerfile_cache.stats(),
+                "secrets": secrets_cache.stats(),
+                "schedules": lru_cache_stats(is_valid_schedule),
+                "memory": lru_cache_stats(is_valid_memory),
+                "cpu": lru_cache_stats(is_valid_cpu),
+                "coalescing": {
+                    "manifests": manifests_flights.stats(),
+                    "dockerfile": dockerfile_flights.stats(),
+                },
+                "admission": render_admission.stats(),
+            },
+        )
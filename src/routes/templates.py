@@ -0,0 +1,32 @@
+import asyncio
+
+from litestar import Controller, HttpMethod, Response, route
+from src.templates import SNAPSHOT_ERRORS, TEMPLATES_VERSION_HEADER, template_index
+
+
+class TemplatesController(Controller):
+    @route(path="/templates/version", http_method=HttpMethod.GET, tags=("Templates",))
+    async def templates_version(self) -> Response:
+        snapshot = template_index.snapshot
+        return Response(
+            status_code=200,
+            content={"version": snapshot.version, "files": len(snapshot.files)},
+            headers={TEMPLATES_VERSION_HEADER: snapshot.version},
+        )
+
+    @route(path="/templates/reload", http_method=HttpMethod.POST, tags=("Templates",))
+    async def reload_templates(self) -> Response:
+        previous = template_index.snapshot
+        try:
+            snapshot = await asyncio.to_thread(template_index.reload)
+        except SNAPSHOT_ERRORS as e:
+            return Response(
+                status_code=422,
+                content={"error": str(e), "version": previous.version},
+                headers={TEMPLATES_VERSION_HEADER: previous.version},
+            )
+        return Response(
+            status_code=200,
+            content={"version": snapshot.version, "previous": previous.version, "files": len(snapshot.files)},
+            headers={TEMPLATES_VERSION_HEADER: snapshot.version},
+        )
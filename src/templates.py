@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterator, Mapping
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any
+
+import yaml
+from jinja2 import DictLoader, Environment, TemplateError
+
+from .config import TEMPLATES_DIR, create_jinja_environment, settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FOLDER = "_default"
+
+TEMPLATES_VERSION_HEADER = "x-templates-version"
+
+# Errors that make a templates tree unusable: the previous snapshot is kept when building a new one fails.
+SNAPSHOT_ERRORS = (OSError, ValueError, yaml.YAMLError, TemplateError)
+
+
+def compile_templates(environment: Environment) -> int:
+    template_names = environment.list_templates(filter_func=lambda name: name.endswith(".jinja2"))
+    for template_name in template_names:
+        environment.get_template(template_name)
+    return len(template_names)
+
+
+def walk_templates(root: Path) -> Iterator[tuple[Path, list[str]]]:
+    """Walk the templates tree in a stable order, skipping hidden files and directories such as `.git`."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith("."))
+        yield Path(dirpath), sorted(name for name in filenames if not name.startswith("."))
+
+
+def folders(team: str, language: str) -> tuple[str, str, str]:
+    return DEFAULT_FOLDER, f"{team}/{DEFAULT_FOLDER}", f"{team}/{language}"
+
+
+class TemplateSnapshot:
+    """Immutable, versioned copy of the templates directory.
+
+    Template sources and parsed `*.yaml` defaults are held in memory, so resolving,
+    loading defaults and rendering (including `include` and `extends`) never touch the
+    filesystem. `version` is a hash of every file path and content.
+    """
+
+    def __init__(self, sources: Mapping[str, str]):
+        self.sources: Mapping[str, str] = MappingProxyType(dict(sources))
+        self.files = frozenset(self.sources)
+        self.version = hashlib.sha256(
+            b"\0".join(f"{path}\0{self.sources[path]}".encode() for path in sorted(self.files)),
+        ).hexdigest()[:16]
+        self.defaults: Mapping[str, Any] = MappingProxyType({
+            path: yaml.safe_load(source) for path, source in self.sources.items() if path.endswith(".yaml")
+        })
+        self.environment = create_jinja_environment(DictLoader(dict(self.sources)))
+        self._resolved = self._build_index()
+
+    @classmethod
+    def load(cls, root: Path) -> "TemplateSnapshot":
+        sources = {}
+        for dirpath, filenames in walk_templates(root):
+            for filename in filenames:
+                full_path = dirpath / filename
+                try:
+                    sources[full_path.relative_to(root).as_posix()] = full_path.read_text(encoding="utf-8")
+                except UnicodeDecodeError:
+                    logger.warning("Skipping %s: not a UTF-8 text file", full_path)
+        return cls(sources)
+
+    def _lookup(self, team: str, language: str, file_name: str) -> str | None:
+        template_path = None
+        for folder in folders(team, language):
+            path = f"{folder}/{file_name}"
+            if path in self.files:
+                template_path = path
+        return template_path
+
+    def _build_index(self) -> dict[tuple[str, str, str], str | None]:
+        resolved: dict[tuple[str, str, str], str | None] = {}
+        file_names = {path.rsplit("/", 1)[-1] for path in self.files}
+        for path in self.files:
+            parts = path.split("/")
+            if len(parts) != 3 or DEFAULT_FOLDER in parts[:2]:
+                continue
+            team, language, _ = parts
+            for file_name in file_names:
+                resolved[(team, language, file_name)] = self._lookup(team, language, file_name)
+        return resolved
+
+    def resolve(self, team: str, language: str, file_name: str) -> str | None:
+        key = (team, language, file_name)
+        if key in self._resolved:
+            return self._resolved[key]
+        return self._lookup(team, language, file_name)
+
+    def compile(self) -> int:
+        return compile_templates(self.environment)
+
+
+class TemplateIndex:
+    """Holds the current snapshot of the templates directory.
+
+    `watch` checks file and directory mtimes every `check_interval` seconds off the event
+    loop and, when something changed, `reload` builds and compiles a new snapshot and swaps
+    it in with a single assignment. Requests take `snapshot` once and keep using it, so a
+    swap never mixes two versions of the templates within one response.
+    """
+
+    def __init__(self, root: Path, check_interval: float):
+        self.root = root
+        self.check_interval = check_interval
+        self._stamp = ""
+        self._snapshot: TemplateSnapshot | None = None
+        self._lock = threading.Lock()
+        self._watcher: asyncio.Task | None = None
+        self._listeners: list[Callable[[], None]] = []
+
+    def _stat(self) -> str:
+        stamps = []
+        for dirpath, filenames in walk_templates(self.root):
+            stamps.append(f"{dirpath}:{dirpath.stat().st_mtime_ns}")
+            for filename in filenames:
+                stat = (dirpath / filename).stat()
+                stamps.append(f"{dirpath}/{filename}:{stat.st_mtime_ns}:{stat.st_size}")
+        return hashlib.sha1("\n".join(stamps).encode(), usedforsecurity=False).hexdigest()
+
+    @property
+    def snapshot(self) -> TemplateSnapshot:
+        self.ensure_built()
+        return self._snapshot  # type: ignore[return-value]
+
+    def ensure_built(self) -> None:
+        if self._snapshot is None:
+            self.build()
+
+    def build(self) -> None:
+        with self._lock:
+            self._stamp = self._stat()
+            self._snapshot = TemplateSnapshot.load(self.root)
+        logger.info("Templates snapshot %s built: %s files", self._snapshot.version, len(self._snapshot.files))
+
+    def reload(self) -> TemplateSnapshot:
+        """Build and compile a new snapshot and swap it in, keeping the current one on errors."""
+        with self._lock:
+            # The stamp is taken first, so a broken tree is reported once and not on every check.
+            self._stamp = self._stat()
+            snapshot = TemplateSnapshot.load(self.root)
+            snapshot.compile()
+            previous, self._snapshot = self._snapshot, snapshot
+        if previous is not None and previous.version == snapshot.version:
+            return snapshot
+        logger.info("Templates snapshot %s swapped in: %s files", snapshot.version, len(snapshot.files))
+        for listener in self._listeners:
+            listener()
+        return snapshot
+
+    def refresh(self) -> None:
+        if self._stat() != self._stamp:
+            self.reload()
+
+    def subscribe(self, listener: Callable[[], None]) -> None:
+        self._listeners.append(listener)
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except SNAPSHOT_ERRORS:
+                logger.exception("Failed to reload templates, keeping snapshot %s", self.snapshot.version)
+
+    async def start_watching(self) -> None:
+        if self.check_interval > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self.watch())
+
+    async def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+
+template_index = TemplateIndex(TEMPLATES_DIR, settings.TEMPLATES_CHECK_INTERVAL)
@@ -1,8 +1,9 @@
 import re
 from enum import Enum
+from pathlib import Path
+from functools import lru_cache
 from typing import Any
 from src.config import settings
-from croniter import croniter
 from .exceptions import ImproperConfig
 
 from pydantic import Field, BaseModel, model_validator, field_validator
@@ -19,10 +20,30 @@ CPU_REGEX = "^[1-9][0-9]{0,4}m$"
 RAM_REGEX_COMPILED = re.compile(RAM_REGEX)
 CPU_REGEX_COMPILED = re.compile(CPU_REGEX)
 
+VALIDATORS_CACHE_SIZE = 1024
+
 
 EnvironmentsEnum = Enum("EnvironmentsEnum", {env.lower(): env.lower() for env in settings.ENVIRONMENTS})  # type: ignore[misc]
 
 
+@lru_cache(maxsize=VALIDATORS_CACHE_SIZE)
+def is_valid_schedule(value: str) -> bool:
+    # Imported on first use: configs without cronjobs never need it.
+    from croniter import croniter
+
+    return croniter.is_valid(value)
+
+
+@lru_cache(maxsize=VALIDATORS_CACHE_SIZE)
+def is_valid_memory(value: str) -> bool:
+    return RAM_REGEX_COMPILED.match(value) is not None
+
+
+@lru_cache(maxsize=VALIDATORS_CACHE_SIZE)
+def is_valid_cpu(value: str) -> bool:
+    return CPU_REGEX_COMPILED.match(value) is not None
+
+
 def validate_autoscalers(values: dict[str, Any]) -> dict[str, Any]:
     hpa_specified = values.get("hpa") is not None
     replicas_specified = values.get("replicas") is not None
@@ -70,13 +91,13 @@ class Requests(BaseModel):
         if isinstance(memory, str):
             memory = {"_default": memory}
         for value in memory.values():
-            if not RAM_REGEX_COMPILED.match(value):
+            if not is_valid_memory(value):
                 raise ImproperConfig("Invalid RAM limit")
 
         if isinstance(cpu, str):
             cpu = {"_default": cpu}
         for value in cpu.values():
-            if not CPU_REGEX_COMPILED.match(value):
+            if not is_valid_cpu(value):
                 raise ImproperConfig("Invalid RAM limit")
 
         return values
@@ -137,11 +158,11 @@ class Cronjobs(BaseModel):
     @field_validator("schedule")
     def validate_schedule(cls, value: str | dict) -> str | dict:  # noqa: N805
         if isinstance(value, str):
-            if not croniter.is_valid(value):
+            if not is_valid_schedule(value):
                 raise ImproperConfig("Invalid cron schedule")
         else:
             for env, v in value.items():
-                if not croniter.is_valid(v):
+                if not is_valid_schedule(v):
                     raise ImproperConfig(f"Invalid cron schedule for env `{env}`")
         return value
 
@@ -199,3 +220,35 @@ class ManifestGenerationRequest(DockerfileGenerationRequest):
 class SecretsEncryptRequest(BaseModel):
     envs: dict[str, str | dict]
     secret_key: bytes | None = None
+
+
+class BulkManifestsItem(BaseModel):
+    id: str
+    metadata: Metadata
+    secret_key: str = ""
+    config: str | dict
+
+
+class RenderTarget(BaseModel):
+    """A repository config rendered by `python -m src.cli`, every environment when `environments` is empty."""
+
+    config: Path
+    image: str
+    project_id: int = 0
+    project_name: str
+    team: str
+    branch_name: str
+    commit: str
+    environments: list[EnvironmentsEnum] = []
+    secret_key: str = ""
+
+
+class IncrementalManifestsRequest(BaseModel):
+    config: str | dict
+    hashes: dict[str, str] = {}
+
+
+class ValidateManifestsItem(BaseModel):
+    id: str
+    team: str
+    config: str | dict
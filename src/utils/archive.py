@@ -0,0 +1,32 @@
+import io
+import re
+import tarfile
+from collections.abc import AsyncIterable, AsyncIterator
+
+ARCHIVE_MEDIA_TYPE = "application/x-tar"
+
+UNSAFE_FILE_NAME_CHARS = re.compile(r"[^\w.-]+")
+
+
+def manifest_file_name(workload_id: str) -> str:
+    """`server/api` -> `server-api.yaml`, anything that could leave the archive root is replaced."""
+    return f"{UNSAFE_FILE_NAME_CHARS.sub('-', workload_id)}.yaml"
+
+
+async def tar_stream(files: AsyncIterable[tuple[str, str]]) -> AsyncIterator[bytes]:
+    """Write `(name, content)` pairs to a tar archive, yielding each file's blocks as soon as it is added.
+
+    Members get a fixed mtime and mode, so equal files always produce an equal archive.
+    """
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w", format=tarfile.PAX_FORMAT) as archive:
+        async for name, content in files:
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
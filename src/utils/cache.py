@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING, Any
+
+import orjson
+
+from src.config import json_default
+from src.metrics import CACHE_REQUESTS, COALESCED_REQUESTS
+
+if TYPE_CHECKING:
+    import functools
+
+
+class BoundedCache[K, T]:
+    def __init__(self, maxsize: int, name: str = ""):
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[K, T] = OrderedDict()
+
+    def _hit(self, key: K) -> None:
+        self._data.move_to_end(key)
+        self.hits += 1
+        if self.name:
+            CACHE_REQUESTS.labels(self.name, "hit").inc()
+
+    def _miss(self) -> None:
+        self.misses += 1
+        if self.name:
+            CACHE_REQUESTS.labels(self.name, "miss").inc()
+
+    def _store(self, key: K, item: T) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = item
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+class LRUCache[V](BoundedCache[str, V]):
+    def get(self, key: str) -> V | None:
+        try:
+            value = self._data[key]
+        except KeyError:
+            self._miss()
+            return None
+        self._hit(key)
+        return value
+
+    def set(self, key: str, value: V) -> None:
+        self._store(key, value)
+
+
+class TTLCache[V](BoundedCache[Any, tuple[float, V]]):
+    def __init__(self, maxsize: int, ttl: float, name: str = ""):
+        super().__init__(maxsize, name)
+        self.ttl = ttl
+
+    def get(self, key: Any) -> V | None:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self._miss()
+            return None
+        self._hit(key)
+        return item[1]
+
+    def set(self, key: Any, value: V) -> None:
+        self._store(key, (time.monotonic() + self.ttl, value))
+
+
+class SingleFlight[T]:
+    """Coalesces concurrent calls with the same key into one.
+
+    The first caller (the leader) starts the call in a task of its own and every caller
+    arriving before it finishes (a follower) awaits that same task, so all of them get the
+    same result or exception. Callers are shielded from each other: a leader that goes
+    away does not cancel the call its followers wait for.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.leaders = 0
+        self.followers = 0
+        self._calls: dict[str, asyncio.Task[T]] = {}
+
+    async def run(self, key: str, function: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(function())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+            role = "leader"
+        else:
+            self.followers += 1
+            role = "follower"
+        COALESCED_REQUESTS.labels(self.name, role).inc()
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Task[T]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Retrieve the exception, so a call whose callers all went away is not reported as never retrieved.
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict[str, int]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "followers": self.followers}
+
+
+def lru_cache_stats(function: "functools._lru_cache_wrapper[Any]") -> dict[str, int | None]:
+    info = function.cache_info()
+    return {"size": info.currsize, "maxsize": info.maxsize, "hits": info.hits, "misses": info.misses}
+
+
+def make_cache_key(*parts: Any) -> str:
+    return hashlib.sha256(orjson.dumps(parts, default=json_default, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def weak_etag(key: str) -> str:
+    """An `ETag` for a response sent compressed or not: equal content, not equal bytes."""
+    return f'W/"{key}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison, as `If-None-Match` requires."""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag.removeprefix("W/") in candidates
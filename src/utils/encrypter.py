@@ -1,15 +1,23 @@
 import binascii
+import hashlib
 import os
 import struct
+from collections.abc import Sequence
+from typing import TYPE_CHECKING
 
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 
+if TYPE_CHECKING:
+    from src.utils.cache import TTLCache
+
 
 class AesEncoder:
     def __init__(self, key: bytes):
         self.key = binascii.unhexlify(key)
+        self.algorithm = algorithms.AES(self.key)
+        self.fingerprint = hashlib.sha256(self.key).hexdigest()
 
     @staticmethod
     def generate_key(length: int = 32) -> bytes:
@@ -30,7 +38,7 @@ class AesEncoder:
         padder = padding.PKCS7(128).padder()
         data = padder.update(data) + padder.finalize()
         cipher = Cipher(
-            algorithms.AES(self.key),
+            self.algorithm,
             modes.CBC(iv),
             backend=default_backend(),
         )
@@ -44,7 +52,7 @@ class AesEncoder:
         iv = data[2 : 2 + iv_size]
         ct = data[2 + iv_size :]
         cipher = Cipher(
-            algorithms.AES(self.key),
+            self.algorithm,
             modes.CBC(iv),
             backend=default_backend(),
         )
@@ -52,3 +60,16 @@ class AesEncoder:
         pt = decryptor.update(ct) + decryptor.finalize()
         unpadder = padding.PKCS7(128).unpadder()
         return unpadder.update(pt) + unpadder.finalize()
+
+    def decrypt_many(self, values: Sequence[bytes], cache: "TTLCache[bytes] | None" = None) -> list[bytes]:
+        """Decrypt `values` with one key schedule, reusing plaintexts from `cache` when given."""
+        decrypted = []
+        for value in values:
+            cache_key = (self.fingerprint, value)
+            plaintext = cache.get(cache_key) if cache is not None else None
+            if plaintext is None:
+                plaintext = self.decrypt(value)
+                if cache is not None:
+                    cache.set(cache_key, plaintext)
+            decrypted.append(plaintext)
+        return decrypted
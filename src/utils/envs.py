@@ -0,0 +1,43 @@
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+
+class LayeredEnvs(Mapping[str, Any]):
+    """Read-only view over env layers, later layers override earlier ones.
+
+    Iteration order matches successive `dict.update` calls of the layers, so templates
+    see the same result as with a merged copy.
+    """
+
+    __slots__ = ("_layers",)
+
+    def __init__(self, *layers: Mapping[str, Any]):
+        self._layers = tuple(layer for layer in layers if layer)
+
+    def __getitem__(self, key: str) -> Any:
+        for layer in reversed(self._layers):
+            if key in layer:
+                return layer[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        if len(self._layers) == 1:
+            yield from self._layers[0]
+            return
+        seen: set[str] = set()
+        for layer in self._layers:
+            for key in layer:
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self) -> int:
+        if len(self._layers) == 1:
+            return len(self._layers[0])
+        return len(set().union(*self._layers))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    def new_child(self, layer: Mapping[str, Any]) -> "LayeredEnvs":
+        return LayeredEnvs(*self._layers, layer)
@@ -0,0 +1,109 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+import orjson
+import yaml
+from litestar import Request
+from litestar._multipart import parse_multipart_form
+from litestar.datastructures import UploadFile
+from pydantic import ValidationError
+
+from src.exceptions import InvalidPayload, PayloadTooLarge
+from src.metrics import observe_stage
+from src.types import DockerfileGenerationRequest, ManifestGenerationRequest
+
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+JSON_MEDIA_TYPES = {"application/json"}
+MULTIPART_MEDIA_TYPE = "multipart/form-data"
+
+
+async def read_body(chunks: AsyncIterator[bytes], max_size: int) -> bytes:
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_size:
+            raise PayloadTooLarge(detail=f"Request body exceeds {max_size} bytes")
+    return bytes(body)
+
+
+async def read_config(request: Request, max_size: int) -> dict[str, Any]:
+    """Read a repository config from a multipart upload, a raw YAML body or a raw JSON body."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        raise PayloadTooLarge(detail=f"Request body exceeds {max_size} bytes")
+
+    media_type, options = request.content_type
+    with observe_stage("body_read"):
+        content = await read_body(request.stream(), max_size)
+        if media_type == MULTIPART_MEDIA_TYPE:
+            # Parsed from the capped body, `request.form()` would buffer the whole upload first.
+            form = parse_multipart_form(
+                body=content,
+                boundary=options.get("boundary", "").encode(),
+                multipart_form_part_limit=request.app.multipart_form_part_limit,
+            )
+            upload = next((value for value in form.values() if isinstance(value, UploadFile)), None)
+            if upload is None:
+                raise InvalidPayload(extra={"error": "Config file is required."})
+            content = await upload.read()
+
+    if media_type in JSON_MEDIA_TYPES:
+        return load_json_config(content)
+    return load_config(content)
+
+
+def ensure_mapping(data: Any) -> dict[str, Any]:
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise InvalidPayload(extra={"error": "Config must be a mapping."})
+    return data
+
+
+def load_config(content: bytes) -> dict[str, Any]:
+    try:
+        with observe_stage("parse"):
+            data = yaml.load(content, Loader=YamlLoader)  # noqa: S506
+    except yaml.YAMLError as e:
+        raise InvalidPayload(extra={"error": str(e)}) from e
+    return ensure_mapping(data)
+
+
+def load_item_config(config: str | dict[str, Any]) -> dict[str, Any]:
+    """Load a config embedded in a JSON request, either as the file content or as an object."""
+    return load_config(config.encode()) if isinstance(config, str) else config
+
+
+def load_json_config(content: bytes) -> dict[str, Any]:
+    if not content.strip():
+        return {}
+    try:
+        with observe_stage("parse"):
+            data = orjson.loads(content)
+    except orjson.JSONDecodeError as e:
+        raise InvalidPayload(extra={"error": str(e)}) from e
+    return ensure_mapping(data)
+
+
+def validate_manifest_config(data: dict[str, Any]) -> ManifestGenerationRequest:
+    try:
+        with observe_stage("validation"):
+            return ManifestGenerationRequest(**data)
+    except ValidationError as e:
+        raise InvalidPayload(extra=e.errors()) from e
+
+
+def validate_manifest_request(data: dict[str, Any], secret_key: str) -> ManifestGenerationRequest:
+    payload = validate_manifest_config(data)
+    if payload.secrets and not secret_key:
+        raise InvalidPayload(extra={"error": "Secret key header is required to decrypt secrets."})
+    return payload
+
+
+def validate_dockerfile_request(data: dict[str, Any]) -> DockerfileGenerationRequest:
+    try:
+        with observe_stage("validation"):
+            return DockerfileGenerationRequest(**data)
+    except ValidationError as e:
+        raise InvalidPayload(extra=e.errors()) from e
@@ -1,10 +1,13 @@
 import asyncio
-from collections.abc import AsyncGenerator
+import shutil
+from collections.abc import AsyncGenerator, Generator
+from pathlib import Path
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from src.app import app
+from src.templates import template_index
 
 
 @pytest.fixture(scope="session")
@@ -23,3 +26,17 @@ def event_loop():
         loop = asyncio.new_event_loop()
     yield loop
     loop.close()
+
+
+@pytest.fixture(scope="session")
+def templates_dir(tmp_path_factory: pytest.TempPathFactory) -> Generator[Path, None, None]:
+    root = tmp_path_factory.mktemp("templates")
+    (root / "_default").mkdir()
+    for template in (Path(__file__).parent / "data").glob("*.jinja2"):
+        shutil.copy(template, root / "_default" / template.name)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(template_index, "root", root)
+        mp.setattr(template_index, "_snapshot", None)
+        yield root
+    template_index._snapshot = None
@@ -0,0 +1,460 @@
+import asyncio
+import io
+import shutil
+import tarfile
+from collections.abc import AsyncIterator
+from pathlib import Path
+from typing import Any
+
+import httpx
+import orjson
+import pytest
+import yaml
+from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from src.config import settings
+from src.core import render_dockerfile
+from src.render import renderer
+from src.templates import template_index
+from src.types import EnvironmentsEnum
+
+CONFIG = """
+engine:
+  language:
+    name: python
+    version: 3.12.4
+  package_manager:
+    name: poetry
+    version: 1.8.3
+  additional_system_packages: []
+
+envs:
+  POSTGRES_MAX_POOLSIZE: 5
+
+servers:
+- command: python run_server.py
+  name: api
+  enabled: true
+  replicas:
+    _default: 1
+    production: 2
+  memory_limits: 256Mi
+  requests:
+    memory: 256Mi
+    cpu: 256m
+  envs:
+    LOG_LEVEL: INFO
+
+cronjobs:
+- command: python cleanup_tasks.py
+  concurrency: forbid
+  enabled:
+    _default: true
+    dev: false
+  name: cleanup-tasks
+  schedule: "*/30 * * * *"
+
+consumers:
+- name: clickstream
+  enabled: true
+  command: python run_consumer.py clickstream
+  replicas: 1
+  requests:
+    memory: 256Mi
+    cpu: 256m
+
+db_migrations:
+- command: alembic upgrade head
+"""
+
+HEADERS = {
+    "x-image": "registry.local/app:abc123",
+    "x-project-id": "1",
+    "x-project-name": "app",
+    "x-current-env": "staging",
+    "x-team": "backend",
+    "x-branch-name": "main",
+    "x-commit-hash": "abc123",
+}
+
+
+def parse_documents(content: str) -> list[dict[str, str]]:
+    return [
+        dict(line.split(": ", 1) for line in document.splitlines() if ": " in line)
+        for document in content.split("\n---\n")
+    ]
+
+
+@pytest.fixture
+def files() -> dict:
+    return {"data": ("app.yaml", CONFIG, "application/x-yaml")}
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests(client: AsyncClient, files: dict) -> None:
+    resp = await client.post("/manifests/generate", headers=HEADERS, files=files)
+    assert resp.status_code == 201
+
+    documents = parse_documents(resp.text)
+    assert [document.get("name") for document in documents] == [None, None, "cleanup-tasks", "clickstream"]
+    assert documents[1]["replicas"] == "1"
+    assert documents[1]["envs"] == str({
+        "POSTGRES_MAX_POOLSIZE": 5,
+        "CURRENT_ENV": "staging",
+        "COMMIT": "abc123",
+        "LOG_LEVEL": "INFO",
+    })
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests_stream(client: AsyncClient, files: dict) -> None:
+    expected = await client.post("/manifests/generate", headers=HEADERS, files=files)
+    resp = await client.post("/manifests/generate", params={"stream": "true"}, headers=HEADERS, files=files)
+    assert resp.status_code == 201
+    assert resp.text == expected.text
+
+
+@pytest.mark.parametrize("params", [{}, {"stream": "true"}, {"format": "tar"}])
+async def test__generate_manifests_missing_template(
+        client: AsyncClient, files: dict, templates_dir: Path, tmp_path: Path, mocker: MockerFixture, params: dict,
+) -> None:
+    shutil.copytree(templates_dir, tmp_path / "templates")
+    (tmp_path / "templates" / "_default" / "consumer.yaml.jinja2").unlink()
+    mocker.patch.object(template_index, "root", tmp_path / "templates")
+    mocker.patch.object(template_index, "_snapshot", None)
+
+    resp = await client.post("/manifests/generate", params=params, headers=HEADERS, files=files)
+    assert resp.status_code == 400
+    assert "No consumer.yaml.jinja2 template found" in resp.json()["message"]
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests_archive(client: AsyncClient, files: dict) -> None:
+    expected = await client.post("/manifests/generate", headers=HEADERS, files=files)
+    resp = await client.post("/manifests/generate", params={"format": "tar"}, headers=HEADERS, files=files)
+    assert resp.status_code == 201
+    assert resp.headers["content-type"] == "application/x-tar"
+    assert resp.headers["etag"] != expected.headers["etag"]
+
+    with tarfile.open(fileobj=io.BytesIO(resp.content)) as archive:
+        members = {member.name: archive.extractfile(member).read().decode() for member in archive}  # type: ignore[union-attr]
+    assert list(members) == [
+        "migration-0.yaml",
+        "server-api.yaml",
+        "cronjob-cleanup-tasks.yaml",
+        "consumer-clickstream.yaml",
+    ]
+    assert "\n---\n".join(members.values()) == expected.text
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests_compressed(client: AsyncClient, files: dict) -> None:
+    # An archive is at least one 10KiB tar record, well above the compression threshold.
+    expected = await client.post("/manifests/generate", headers=HEADERS, files=files)
+    resp = await client.post(
+        "/manifests/generate", headers={**HEADERS, "accept-encoding": "gzip"}, files=files, params={"format": "tar"},
+    )
+    assert resp.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in resp.headers["vary"].lower()
+    with tarfile.open(fileobj=io.BytesIO(resp.content)) as archive:
+        assert len(archive.getmembers()) == len(parse_documents(expected.text))
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests_profiled(
+        client: AsyncClient, files: dict, mocker: MockerFixture, tmp_path: Path,
+) -> None:
+    resp = await client.post("/manifests/generate", headers={**HEADERS, "x-manman-profile": "timing"}, files=files)
+    assert "server-timing" not in resp.headers
+
+    mocker.patch.object(settings, "PROFILING_ENABLED", new=True)
+    mocker.patch.object(settings, "PROFILES_DIR", tmp_path)
+    resp = await client.post("/manifests/generate", headers={**HEADERS, "x-manman-profile": "timing"}, files=files)
+    assert resp.status_code == 201
+    # Cached by the previous request, rendered again to report the stages.
+    timing = resp.headers["server-timing"]
+    for stage in ["parse", "validation", "template_resolution", 'render;desc="server/api"', "total"]:
+        assert f"{stage};dur=" in timing
+    assert "x-manman-profile-id" not in resp.headers
+
+    resp = await client.post("/manifests/generate", headers={**HEADERS, "x-manman-profile": "cprofile"}, files=files)
+    profile_id = resp.headers["x-manman-profile-id"]
+    assert (await client.get("/profiles")).json() == [profile_id]
+
+    resp = await client.get(f"/profiles/{profile_id}")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/octet-stream"
+    resp = await client.get(f"/profiles/{profile_id}", params={"format": "text", "limit": 5})
+    assert "function calls" in resp.text
+    assert (await client.get("/profiles/not-a-profile")).status_code == 404
+
+
+async def test__generate_manifests_invalid_yaml(client: AsyncClient) -> None:
+    resp = await client.post(
+        "/manifests/generate", headers=HEADERS, files={"data": ("app.yaml", "engine: [", "application/x-yaml")}
+    )
+    assert resp.status_code == 400
+    assert "error" in resp.json()
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_environments_manifests(client: AsyncClient, files: dict) -> None:
+    resp = await client.post(
+        "/manifests/generate/environments", headers={**HEADERS, "x-current-env": "dev, production"}, files=files
+    )
+    assert resp.status_code == 201
+
+    bundles = resp.json()
+    assert list(bundles) == ["dev", "production"]
+    dev = parse_documents(bundles["dev"])
+    production = parse_documents(bundles["production"])
+    assert [document.get("name") for document in dev] == [None, None, "clickstream"]
+    assert production[1]["replicas"] == "2"
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_all_environments_manifests(client: AsyncClient, files: dict) -> None:
+    resp = await client.post(
+        "/manifests/generate/environments", headers={**HEADERS, "x-current-env": "all"}, files=files
+    )
+    assert resp.status_code == 201
+    assert list(resp.json()) == [env.value for env in EnvironmentsEnum]
+
+
+async def test__generate_environments_manifests_unknown_env(client: AsyncClient, files: dict) -> None:
+    resp = await client.post(
+        "/manifests/generate/environments", headers={**HEADERS, "x-current-env": "dev,unknown"}, files=files
+    )
+    assert resp.status_code == 400
+    assert resp.json() == {"error": "Unknown environment `unknown`"}
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_dockerfile(client: AsyncClient, files: dict) -> None:
+    resp = await client.post("/dockerfiles/generate", headers=HEADERS, files=files)
+    assert resp.status_code == 201
+    assert "language: python" in resp.text
+
+
+async def test__generate_dockerfile_cache(
+    client: AsyncClient, files: dict, templates_dir: Path, mocker: MockerFixture
+) -> None:
+    headers = {**HEADERS, "x-team": "dockerfile-cache"}
+    resp = await client.post("/dockerfiles/generate", headers=headers, files=files)
+    assert resp.status_code == 201
+
+    render = mocker.spy(renderer, "render")
+    other_project = {**headers, "x-project-name": "other", "x-commit-hash": "other"}
+    cached = await client.post("/dockerfiles/generate", headers=other_project, files=files)
+    assert cached.text == resp.text
+    assert cached.headers["etag"] == resp.headers["etag"]
+    render.assert_not_called()
+
+    (templates_dir / "_default" / "README.md").write_text("")
+    try:
+        template_index.refresh()
+        changed = await client.post("/dockerfiles/generate", headers=headers, files=files)
+    finally:
+        (templates_dir / "_default" / "README.md").unlink()
+        template_index.refresh()
+    assert changed.headers["etag"] != resp.headers["etag"]
+    render.assert_called_once()
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_dockerfile_coalesced(client: AsyncClient, files: dict, mocker: MockerFixture) -> None:
+    async def slow_render(*args: Any) -> str:
+        await asyncio.sleep(0.05)
+        return await render_dockerfile(*args)
+
+    render = mocker.patch("src.routes.dockerfiles.render_dockerfile", side_effect=slow_render)
+    headers = {**HEADERS, "x-team": "coalesced"}
+    responses = await asyncio.gather(*[
+        client.post("/dockerfiles/generate", headers=headers, files=files) for _ in range(5)
+    ])
+
+    assert [resp.status_code for resp in responses] == [201] * 5
+    assert len({resp.text for resp in responses}) == 1
+    render.assert_called_once()
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_bulk_manifests(client: AsyncClient) -> None:
+    metadata = {
+        "image": "registry.local/app:abc123",
+        "project_id": 1,
+        "project_name": "app",
+        "current_env": "staging",
+        "team": "backend",
+        "branch_name": "main",
+        "commit": "abc123",
+    }
+    lines = [
+        orjson.dumps({"id": "app", "metadata": metadata, "config": CONFIG}),
+        orjson.dumps({"id": "broken", "metadata": metadata, "config": "engine: ["}),
+        b"not json",
+        orjson.dumps({"id": "list", "metadata": metadata, "config": "- a\n- b"}),
+    ]
+    resp = await client.post("/manifests/generate/bulk", content=b"\n".join(lines))
+    assert resp.status_code == 200
+
+    results = {result["line"]: result for result in map(orjson.loads, resp.text.splitlines())}
+    assert results[1]["id"] == "app"
+    assert results[1]["status"] == 201
+    assert len(parse_documents(results[1]["manifests"])) == 4
+    assert results[2]["id"] == "broken"
+    assert results[2]["status"] == 400
+    assert results[3]["id"] is None
+    assert results[3]["status"] == 400
+    assert results[4] == {"line": 4, "id": "list", "status": 400, "error": {"error": "Config must be a mapping."}}
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_incremental_manifests(client: AsyncClient, mocker: MockerFixture) -> None:
+    resp = await client.post("/manifests/generate/incremental", headers=HEADERS, json={"config": CONFIG})
+    assert resp.status_code == 201
+    first = resp.json()
+    assert [manifest["id"] for manifest in first["manifests"]] == [
+        "migration/0",
+        "server/api",
+        "cronjob/cleanup-tasks",
+        "consumer/clickstream",
+    ]
+    assert first["unchanged"] == []
+    assert first["removed"] == []
+
+    render = mocker.spy(renderer, "render")
+    config = CONFIG.replace("LOG_LEVEL: INFO", "LOG_LEVEL: DEBUG")
+    hashes = {**first["hashes"], "consumer/legacy": "0" * 64}
+    resp = await client.post(
+        "/manifests/generate/incremental", headers=HEADERS, json={"config": config, "hashes": hashes}
+    )
+    assert resp.status_code == 201
+    second = resp.json()
+    assert [manifest["id"] for manifest in second["manifests"]] == ["server/api"]
+    assert "LOG_LEVEL': 'DEBUG" in second["manifests"][0]["manifest"]
+    assert second["unchanged"] == ["migration/0", "cronjob/cleanup-tasks", "consumer/clickstream"]
+    assert second["removed"] == ["consumer/legacy"]
+    assert second["hashes"]["server/api"] != first["hashes"]["server/api"]
+    render.assert_called_once()
+
+
+async def test__generate_incremental_manifests_invalid_body(client: AsyncClient) -> None:
+    resp = await client.post("/manifests/generate/incremental", headers=HEADERS, json={"hashes": {}})
+    assert resp.status_code == 400
+
+
+async def test__generate_bulk_manifests_body_too_large(client: AsyncClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(settings, "BULK_MAX_BODY_SIZE", 8)
+    resp = await client.post("/manifests/generate/bulk", content=b"0123456789")
+    assert resp.status_code == 413
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__generate_manifests_etag(client: AsyncClient, files: dict) -> None:
+    resp = await client.post("/manifests/generate", headers={**HEADERS, "x-commit-hash": "etag"}, files=files)
+    assert resp.status_code == 201
+    etag = resp.headers["etag"]
+    assert etag.startswith('W/"')
+
+    stats = (await client.get("/cache")).json()["render"]
+    cached = await client.post("/manifests/generate", headers={**HEADERS, "x-commit-hash": "etag"}, files=files)
+    assert cached.text == resp.text
+    assert cached.headers["etag"] == etag
+    assert (await client.get("/cache")).json()["render"]["hits"] == stats["hits"] + 1
+
+    not_modified = await client.post(
+        "/manifests/generate", headers={**HEADERS, "x-commit-hash": "etag", "if-none-match": etag}, files=files
+    )
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    changed = await client.post(
+        "/manifests/generate", headers={**HEADERS, "x-commit-hash": "other", "if-none-match": etag}, files=files
+    )
+    assert changed.status_code == 201
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.usefixtures("templates_dir")
+@pytest.mark.parametrize(
+    ("content", "content_type"),
+    [
+        (CONFIG.encode(), "application/yaml"),
+        (orjson.dumps(yaml.safe_load(CONFIG)), "application/json"),
+    ],
+)
+async def test__generate_manifests_raw_body(
+    client: AsyncClient, files: dict, content: bytes, content_type: str
+) -> None:
+    expected = await client.post("/manifests/generate", headers=HEADERS, files=files)
+    resp = await client.post(
+        "/manifests/generate", headers={**HEADERS, "content-type": content_type}, content=content
+    )
+    assert resp.status_code == 201
+    assert resp.text == expected.text
+
+
+async def test__generate_manifests_invalid_json(client: AsyncClient) -> None:
+    resp = await client.post(
+        "/manifests/generate", headers={**HEADERS, "content-type": "application/json"}, content=b"{"
+    )
+    assert resp.status_code == 400
+    assert "error" in resp.json()
+
+
+async def test__generate_manifests_body_too_large(client: AsyncClient, mocker: MockerFixture) -> None:
+    mocker.patch.object(settings, "MAX_BODY_SIZE", 8)
+    resp = await client.post(
+        "/manifests/generate", headers={**HEADERS, "content-type": "application/yaml"}, content=CONFIG
+    )
+    assert resp.status_code == 413
+
+
+
+async def test__generate_manifests_multipart_too_large(
+    client: AsyncClient, mocker: MockerFixture, files: dict
+) -> None:
+    mocker.patch.object(settings, "MAX_BODY_SIZE", 64)
+    upload = httpx.Request("POST", "/manifests/generate", files=files)
+
+    sent = []
+
+    async def chunks() -> AsyncIterator[bytes]:
+        # Sent without a content-length, so only the stream is there to check.
+        for chunk in [upload.read()[:32]] * 10:
+            sent.append(chunk)
+            yield chunk
+
+    headers = {**HEADERS, "content-type": upload.headers["content-type"]}
+    resp = await client.post("/manifests/generate", headers=headers, content=chunks())
+    assert resp.status_code == 413
+    assert len(sent) < 10
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__validate_manifests(client: AsyncClient, mocker: MockerFixture) -> None:
+    render = mocker.patch("src.core.renderer.render")
+    invalid_schedule = CONFIG.replace("schedule:", "schedule: '61 * * * *'\n  old_schedule:", 1)
+    lines = [
+        orjson.dumps({"id": "app", "team": "backend", "config": CONFIG}),
+        orjson.dumps({"id": "broken", "team": "backend", "config": "engine: ["}),
+        orjson.dumps({"id": "schedule", "team": "backend", "config": invalid_schedule}),
+        b"not json",
+    ]
+    resp = await client.post("/manifests/validate", content=b"\n".join(lines))
+    assert resp.status_code == 200
+
+    results = resp.json()
+    assert results[0]["status"] == 200
+    assert results[0]["templates"]["server.yaml.jinja2"] == "_default/server.yaml.jinja2"
+    assert [(result["id"], result["status"]) for result in results[1:]] == [
+        ("broken", 400),
+        ("schedule", 400),
+        (None, 400),
+    ]
+    render.assert_not_called()
+
+    stats = (await client.get("/cache")).json()["schedules"]
+    assert stats["size"] > 0
+    assert stats["maxsize"] == 1024
@@ -1,5 +1,11 @@
+import asyncio
+import threading
+
 import pytest
 from httpx import AsyncClient
+from pytest_mock import MockerFixture
+
+from src.render import WarmUp
 
 
 @pytest.mark.parametrize("path", ["/liveness", "/ready"])
@@ -7,3 +13,50 @@ async def test__system_endpoints(client: AsyncClient, path: str) -> None:
     resp = await client.get(path)
     assert resp.status_code == 200
 
+
+
+async def test__readiness_waits_for_warm_up(client: AsyncClient, mocker: MockerFixture) -> None:
+    started = threading.Event()
+    release = threading.Event()
+
+    def warm_up() -> None:
+        started.set()
+        release.wait(5)
+
+    warm_up_state = WarmUp(mocker.Mock(warm_up=warm_up))
+    mocker.patch("src.routes.system.warm_up", warm_up_state)
+    await warm_up_state.start()
+    await asyncio.to_thread(started.wait, 5)
+
+    assert (await client.get("/ready")).status_code == 503
+    release.set()
+    await warm_up_state._task
+    assert (await client.get("/ready")).status_code == 200
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__metrics(client: AsyncClient) -> None:
+    await client.post(
+        "/dockerfiles/generate",
+        headers={
+            "x-project-id": "1",
+            "x-project-name": "app",
+            "x-current-env": "dev",
+            "x-team": "metrics",
+            "x-branch-name": "main",
+            "x-commit-hash": "abc123",
+            "content-type": "application/yaml",
+        },
+        content="engine: {language: {name: python, version: '3.12'}, additional_system_packages: [], "
+        "package_manager: {name: poetry, version: '1.8'}}",
+    )
+
+    resp = await client.get("/metrics")
+    assert resp.status_code == 200
+    assert 'manman_requests_total{app_name="manman",method="POST",path="/dockerfiles/generate"' in resp.text
+    for stage in ["body_read", "parse", "validation", "template_resolution", "render"]:
+        assert f'manman_stage_duration_seconds_count{{stage="{stage}"}}' in resp.text
+    assert 'manman_renders_total{kind="dockerfile"}' in resp.text
+    assert "manman_admission_wait_seconds_count" in resp.text
+    assert 'manman_cache_requests_total{cache="dockerfile",result="miss"}' in resp.text
+    assert 'manman_coalesced_requests_total{flight="dockerfile",role="leader"}' in resp.text
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from httpx import AsyncClient
+
+HEADERS = {
+    "x-project-id": "1",
+    "x-project-name": "app",
+    "x-current-env": "dev",
+    "x-team": "backend",
+    "x-branch-name": "main",
+    "x-commit-hash": "abc123",
+    "content-type": "application/json",
+}
+ENGINE = {
+    "engine": {
+        "language": {"name": "python", "version": "3.12"},
+        "additional_system_packages": [],
+        "package_manager": {"name": "poetry", "version": "1.8"},
+    },
+}
+
+
+async def test__reload_templates(client: AsyncClient, templates_dir: Path) -> None:
+    version = (await client.get("/templates/version")).json()["version"]
+    dockerfile = templates_dir / "_default" / "dockerfile.jinja2"
+    source = dockerfile.read_text()
+
+    dockerfile.write_text(source + "\n# reloaded")
+    try:
+        resp = await client.post("/templates/reload")
+        assert resp.status_code == 200
+        reloaded = resp.json()
+        assert reloaded["previous"] == version
+        assert reloaded["version"] != version
+
+        resp = await client.post("/dockerfiles/generate", headers=HEADERS, json=ENGINE)
+        assert resp.headers["x-templates-version"] == reloaded["version"]
+        assert resp.text.endswith("# reloaded")
+    finally:
+        dockerfile.write_text(source)
+        await client.post("/templates/reload")
+
+    assert (await client.get("/templates/version")).json()["version"] == version
+
+
+async def test__reload_templates_keeps_snapshot_on_error(client: AsyncClient, templates_dir: Path) -> None:
+    version = (await client.get("/templates/version")).json()["version"]
+    broken = templates_dir / "_default" / "broken.yaml.jinja2"
+
+    broken.write_text("{% if %}")
+    try:
+        resp = await client.post("/templates/reload")
+    finally:
+        broken.unlink()
+
+    assert resp.status_code == 422
+    assert resp.json()["version"] == version
+    assert (await client.get("/templates/version")).headers["x-templates-version"] == version
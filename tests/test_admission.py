@@ -0,0 +1,116 @@
+import asyncio
+from typing import Any
+
+import pytest
+from httpx import AsyncClient
+from litestar.exceptions import ServiceUnavailableException, TooManyRequestsException
+from prometheus_client import REGISTRY
+from pytest_mock import MockerFixture
+
+from src.admission import AdmissionController
+
+
+def controller(**limits: Any) -> AdmissionController:
+    return AdmissionController(
+        **{"max_in_flight": 1, "queue_size": 10, "team_max_in_flight": 0, "team_queue_size": 10, "queue_timeout": 5}
+        | limits,
+    )
+
+
+async def test__admission_serves_teams_in_turn() -> None:
+    admission = controller()
+    order = []
+
+    async def render(team: str) -> None:
+        async with admission.admit(team):
+            order.append(team)
+            await asyncio.sleep(0)
+
+    await admission.acquire("ci-storm")
+    tasks = [asyncio.create_task(render(team)) for team in ["ci-storm"] * 3 + ["backend", "data"]]
+    await asyncio.sleep(0)
+    assert admission.stats() == {"in_flight": 1, "queued": 5, "teams_queued": 3, "admitted": 1, "rejected": 0}
+
+    admission.release("ci-storm")
+    await asyncio.gather(*tasks)
+    assert order == ["ci-storm", "backend", "data", "ci-storm", "ci-storm"]
+    assert admission.stats()["in_flight"] == admission.stats()["queued"] == 0
+
+
+async def test__admission_team_limit() -> None:
+    admission = controller(max_in_flight=0, team_max_in_flight=1, team_queue_size=1)
+
+    await admission.acquire("ci-storm")
+    await admission.acquire("backend")
+    waiter = asyncio.create_task(admission.acquire("ci-storm"))
+    await asyncio.sleep(0)
+    with pytest.raises(TooManyRequestsException) as e:
+        await admission.acquire("ci-storm")
+    assert e.value.headers == {"retry-after": "5"}
+
+    admission.release("ci-storm")
+    await waiter
+    assert admission.stats() == {"in_flight": 2, "queued": 0, "teams_queued": 0, "admitted": 3, "rejected": 1}
+
+
+async def test__admission_queue_full_and_timeout() -> None:
+    admission = controller(queue_size=1, queue_timeout=0.01)
+
+    await admission.acquire("backend")
+    waiter = asyncio.create_task(admission.acquire("data"))
+    await asyncio.sleep(0)
+    with pytest.raises(ServiceUnavailableException):
+        await admission.acquire("frontend")
+    with pytest.raises(ServiceUnavailableException):
+        await waiter
+    assert admission.stats()["queued"] == 0
+
+    # A request that went away does not hold on to its place.
+    waiter = asyncio.create_task(admission.acquire("data"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    admission.release("backend")
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert admission.stats()["in_flight"] == admission.stats()["queued"] == 0
+
+
+async def test__admission_metric_teams() -> None:
+    admission = controller(max_in_flight=0, team_max_in_flight=1, team_queue_size=0, metric_teams=["backend"])
+
+    def rejected(team: str) -> float:
+        labels = {"team": team, "reason": "team_queue_full"}
+        return REGISTRY.get_sample_value("manman_admission_rejected_total", labels) or 0.0
+
+    before = {team: rejected(team) for team in ["backend", "ci-storm-1", "other"]}
+    for team in ["backend", "ci-storm-1", "ci-storm-2"]:
+        await admission.acquire(team)
+        with pytest.raises(TooManyRequestsException):
+            await admission.acquire(team)
+
+    assert rejected("backend") == before["backend"] + 1
+    assert rejected("ci-storm-1") == before["ci-storm-1"] == 0
+    assert rejected("other") == before["other"] + 2
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__dockerfile_rejected(client: AsyncClient, mocker: MockerFixture) -> None:
+    admission = controller(team_max_in_flight=1, team_queue_size=0)
+    mocker.patch("src.routes.dockerfiles.render_admission", admission)
+    await admission.acquire("admission")
+
+    resp = await client.post(
+        "/dockerfiles/generate",
+        headers={
+            "x-project-id": "1",
+            "x-project-name": "app",
+            "x-current-env": "dev",
+            "x-team": "admission",
+            "x-branch-name": "main",
+            "x-commit-hash": "abc123",
+            "content-type": "application/yaml",
+        },
+        content="engine: {language: {name: python, version: '3.12'}, additional_system_packages: [], "
+        "package_manager: {name: poetry, version: '1.8'}}",
+    )
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == "5"
@@ -0,0 +1,45 @@
+import pytest
+from httpx import AsyncClient
+
+from benchmarks.configs import Scale, make_config
+from benchmarks.loadtest import DEFAULT_MIX, ENDPOINTS, build_requests, parse_mix, run_load, summarize
+from benchmarks.run import SCALES
+from src.types import ManifestGenerationRequest
+from src.utils.encrypter import AesEncoder
+
+
+@pytest.mark.parametrize("scale", SCALES.values(), ids=SCALES.keys())
+def test__synthetic_config_is_valid(scale: Scale) -> None:
+    payload = ManifestGenerationRequest(**make_config(scale, AesEncoder.generate_key()))
+
+    assert len(payload.servers) == scale.servers
+    assert len(payload.cronjobs) == scale.cronjobs
+    assert len(payload.consumers) == scale.consumers
+    assert len(payload.db_migrations) == scale.migrations
+    assert len(payload.secrets.envs) == scale.secrets
+    assert len(payload.envs) == scale.envs
+
+
+def test__load_requests_are_reproducible() -> None:
+    secret_key = AesEncoder.generate_key()
+    corpus = {"service": make_config(Scale(), secret_key), "api": make_config(Scale(servers=3), secret_key)}
+    mix = parse_mix(DEFAULT_MIX)
+
+    requests = build_requests(corpus, mix, "key", 50, seed=1)
+    assert requests == build_requests(corpus, mix, "key", 50, seed=1)
+    assert requests != build_requests(corpus, mix, "key", 50, seed=2)
+    assert {request.endpoint for request in requests} == set(ENDPOINTS)
+
+
+@pytest.mark.usefixtures("templates_dir")
+async def test__run_load(client: AsyncClient) -> None:
+    secret_key = AesEncoder.generate_key()
+    corpus = {"service": make_config(Scale(), secret_key)}
+    requests = build_requests(corpus, parse_mix(DEFAULT_MIX), secret_key.decode(), 20, seed=0)
+
+    samples, elapsed = await run_load(client, requests, concurrency=4, duration=0.2, warmup=0.05)
+    summary = summarize(samples, elapsed)
+
+    assert summary["all"]["requests"] == len(samples) > 0
+    assert summary["all"]["errors"] == 0
+    assert summary["all"]["p50"] <= summary["all"]["p95"] <= summary["all"]["p99"] <= summary["all"]["max"]
@@ -0,0 +1,79 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from src.cli import STATE_FILE_NAME, main
+
+CONFIG = """
+engine:
+  language:
+    name: python
+    version: 3.12.4
+  package_manager:
+    name: poetry
+    version: 1.8.3
+  additional_system_packages: []
+servers:
+- command: python run_server.py
+  name: {name}
+  enabled: true
+  requests:
+    cpu: 100m
+    memory: 128Mi
+  memory_limits: 256Mi
+  replicas: 1
+"""
+
+METADATA = ["--image", "registry/app:1", "--team", "platform", "--branch-name", "main", "--commit", "abc123"]
+
+
+@pytest.fixture
+def configs(tmp_path: Path) -> Path:
+    directory = tmp_path / "configs"
+    directory.mkdir()
+    (directory / "api.yaml").write_text(CONFIG.format(name="api"))
+    (directory / "billing.yaml").write_text(CONFIG.format(name="billing"))
+    return directory
+
+
+def test__cli_renders_directory(
+    configs: Path, templates_dir: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    # Workers render inline, but only workers: the environment of the caller is left as it was.
+    monkeypatch.setenv("RENDER_EXECUTOR", "process")
+    output = tmp_path / "out"
+    args = [str(configs), "-o", str(output), "--templates", str(templates_dir), "-e", "dev", "--workers", "2"]
+
+    assert main([*args, *METADATA]) == 0
+    api = output / "api" / "dev.yaml"
+    assert "name: api" in api.read_text()
+    assert (output / "billing" / "dev.yaml").exists()
+    assert (output / STATE_FILE_NAME).exists()
+    assert os.environ["RENDER_EXECUTOR"] == "process"
+
+    # Unchanged outputs are neither rendered nor written again.
+    api.write_text("edited")
+    assert main([*args, *METADATA]) == 0
+    assert api.read_text() == "edited"
+
+    (configs / "api.yaml").write_text(CONFIG.format(name="api").replace("replicas: 1", "replicas: 2"))
+    assert main([*args, *METADATA]) == 0
+    assert "replicas: 2" in api.read_text()
+
+
+def test__cli_renders_list_split(configs: Path, templates_dir: Path, tmp_path: Path) -> None:
+    repositories = tmp_path / "repositories.yaml"
+    repositories.write_text(
+        "- {config: configs/api.yaml, project_name: api, environments: [staging]}\n"
+        "- {config: configs/missing.yaml, project_name: missing}\n"
+    )
+    output = tmp_path / "out"
+    (output / "api" / "staging").mkdir(parents=True)
+    (output / "api" / "staging" / "server-removed.yaml").write_text("")
+
+    code = main([str(repositories), "-o", str(output), "--templates", str(templates_dir), "--split", *METADATA])
+
+    assert code == 1
+    assert sorted(path.name for path in (output / "api" / "staging").iterdir()) == ["server-api.yaml"]
+    assert not (output / "missing").exists()
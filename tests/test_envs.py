@@ -0,0 +1,29 @@
+import orjson
+from jinja2 import DictLoader
+
+from src.config import create_jinja_environment, jsonify
+from src.utils.envs import LayeredEnvs
+
+
+def test__layered_envs_matches_merged_dict() -> None:
+    global_envs = {"A": "1", "B": "2", "COMMIT": "old"}
+    secret_envs = {"COMMIT": "abc", "PASSWORD": "secret"}
+    workload_envs = {"B": "3", "C": "4"}
+
+    merged = dict(global_envs)
+    merged.update(secret_envs)
+    merged.update(workload_envs)
+
+    envs = LayeredEnvs(global_envs, secret_envs).new_child(workload_envs)
+    assert dict(envs) == merged
+    assert list(envs.items()) == list(merged.items())
+    assert len(envs) == len(merged)
+    assert repr(envs) == repr(merged)
+    assert orjson.loads(jsonify(envs)) == merged
+
+
+def test__layered_envs_tojson() -> None:
+    environment = create_jinja_environment(DictLoader({"envs.jinja2": "{{ envs | tojson }}"}), enable_async=False)
+    envs = LayeredEnvs({"B": "1", "A": "2"}).new_child({"C": "3"})
+
+    assert orjson.loads(environment.get_template("envs.jinja2").render(envs=envs)) == {"A": "2", "B": "1", "C": "3"}
@@ -0,0 +1,75 @@
+import gc
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+
+import uvicorn
+from pytest_mock import MockerFixture
+
+from src.app import app
+from src.launcher import CRASH_LIMIT, POLL_INTERVAL, Supervisor, queue_listeners
+from src.templates import template_index
+
+
+def test__queue_listeners() -> None:
+    handler = QueueHandler(queue.Queue())
+    handler.listener = QueueListener(handler.queue)  # type: ignore[attr-defined]
+    logger = logging.getLogger("tests.launcher")
+    logger.addHandler(handler)
+    try:
+        assert handler.listener in queue_listeners()  # type: ignore[attr-defined]
+    finally:
+        logger.removeHandler(handler)
+
+
+def test__supervisor_warm_up(templates_dir: Path) -> None:
+    supervisor = Supervisor(uvicorn.Config(app), workers=2, graceful_timeout=1)
+    try:
+        supervisor.warm_up()
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+
+    environment = template_index.snapshot.environment
+    assert environment.cache is not None
+    assert len(environment.cache) == len(environment.list_templates(filter_func=lambda name: name.endswith(".jinja2")))
+
+
+def test__supervisor_listeners_paused() -> None:
+    listener = QueueListener(queue.Queue())
+    listener.start()
+    supervisor = Supervisor(uvicorn.Config(app), workers=1, graceful_timeout=1)
+    supervisor.listeners = {listener}
+
+    with supervisor.listeners_paused():
+        assert listener._thread is None  # type: ignore[attr-defined]
+    assert listener._thread is not None  # type: ignore[attr-defined]
+    listener.stop()
+
+
+def test__supervisor_reap_backs_off_and_gives_up(mocker: MockerFixture) -> None:
+    supervisor = Supervisor(uvicorn.Config(app), workers=1, graceful_timeout=1)
+    supervisor.listeners = set()
+    spawn = mocker.patch.object(supervisor, "spawn")
+    monotonic = mocker.patch("src.launcher.time.monotonic", return_value=100.0)
+    waitpid = mocker.patch("src.launcher.os.waitpid")
+
+    for crash in range(1, CRASH_LIMIT):
+        supervisor.pids = {crash}
+        waitpid.side_effect = [(crash, 256), (0, 0)]
+        supervisor.reap()
+        assert supervisor.respawns == [monotonic.return_value + POLL_INTERVAL * 2 ** (crash - 1)]
+        assert spawn.call_count == crash - 1
+
+        monotonic.return_value = supervisor.respawns[0]
+        supervisor.reap()
+        assert supervisor.respawns == []
+        assert spawn.call_count == crash
+
+    supervisor.pids = {CRASH_LIMIT}
+    waitpid.side_effect = [(CRASH_LIMIT, 256)]
+    supervisor.reap()
+    assert supervisor.should_exit
+    assert supervisor.exit_code == 1
+    assert spawn.call_count == CRASH_LIMIT - 1
@@ -0,0 +1,91 @@
+import pickle
+from pathlib import Path
+
+from src.config import JSON_MEMO_VARIABLE, JsonMemo
+from src.core import RenderContext, workload
+from src.render import PoolRenderer, worker_context
+from src.templates import TemplateIndex, TemplateSnapshot
+
+
+async def test__pool_renderer(tmp_path: Path) -> None:
+    (tmp_path / "_default").mkdir()
+    (tmp_path / "_default" / "server.yaml.jinja2").write_text("name: {{ name }}\nenvs: {{ envs | jsonify }}")
+
+    templates = TemplateIndex(tmp_path, check_interval=0)
+    renderer = PoolRenderer(templates, workers=1, queue_size=2, queue_timeout=10)
+    try:
+        renderer.warm_up()
+        rendered = await renderer.render(
+            templates.snapshot, "_default/server.yaml.jinja2", name="api", envs={"LOG_LEVEL": "INFO"}
+        )
+        pinned = TemplateSnapshot({"_default/server.yaml.jinja2": "name: {{ name }}"})
+        rendered_pinned = await renderer.render(pinned, "_default/server.yaml.jinja2", name="api")
+    finally:
+        renderer.shutdown()
+
+    assert rendered == 'name: api\nenvs: {"LOG_LEVEL":"INFO"}'
+    assert rendered_pinned == "name: api"
+
+
+async def test__pool_renderer_reload(tmp_path: Path) -> None:
+    (tmp_path / "_default").mkdir()
+    template = tmp_path / "_default" / "server.yaml.jinja2"
+    template.write_text("name: {{ name }}")
+
+    templates = TemplateIndex(tmp_path, check_interval=0)
+    renderer = PoolRenderer(templates, workers=1, queue_size=2, queue_timeout=10)
+    templates.subscribe(renderer.reload)
+    try:
+        renderer.warm_up()
+        previous = renderer._executor
+        template.write_text("app: {{ name }}")
+        snapshot = templates.reload()
+        # The new pool is up before the reload returns.
+        assert renderer._executor is not previous
+        assert renderer._version == snapshot.version
+        rendered = await renderer.render(snapshot, "_default/server.yaml.jinja2", name="api")
+    finally:
+        renderer.shutdown()
+
+    assert rendered == "app: api"
+
+
+async def test__pool_renderer_shared_context(tmp_path: Path) -> None:
+    (tmp_path / "_default").mkdir()
+    (tmp_path / "_default" / "job.yaml.jinja2").write_text("tolerations: {{ tolerations | jsonify }}\nname: {{ name }}")
+
+    templates = TemplateIndex(tmp_path, check_interval=0)
+    renderer = PoolRenderer(templates, workers=1, queue_size=2, queue_timeout=10)
+    shared = RenderContext(tolerations=[{"key": "spot"}])
+    job = workload("job/cleanup", "job", "_default/job.yaml.jinja2", shared, name="cleanup")
+    try:
+        rendered = await renderer.render(templates.snapshot, job.template_path, **job.template_context())
+    finally:
+        renderer.shutdown()
+
+    assert rendered == 'tolerations: [{"key":"spot"}]\nname: cleanup'
+
+
+def test__worker_context_is_pickled_without_memo() -> None:
+    shared = RenderContext(tolerations=[{"key": "spot"}])
+    context = workload("job/cleanup", "job", "_default/job.yaml.jinja2", shared, name="cleanup").template_context()
+
+    # Identity does not survive pickling, a memo would never hit in a worker.
+    unpickled = pickle.loads(pickle.dumps(context))
+    assert id(unpickled["tolerations"]) not in unpickled[JSON_MEMO_VARIABLE]._items
+
+    sent = pickle.loads(pickle.dumps(worker_context(context)))
+    assert JSON_MEMO_VARIABLE not in sent
+    assert sent == {"tolerations": [{"key": "spot"}], "name": "cleanup"}
+
+
+def test__json_memo() -> None:
+    memo = JsonMemo()
+    tolerations = [{"key": "spot"}]
+
+    assert memo.dumps(tolerations) == '[{"key":"spot"}]'
+    tolerations.append({"key": "gpu"})
+    # Output is reused by identity: shared values are not modified while a request renders.
+    assert memo.dumps(tolerations) == '[{"key":"spot"}]'
+    assert memo.dumps([{"key": "spot"}, {"key": "gpu"}]) == '[{"key":"spot"},{"key":"gpu"}]'
+    assert memo.dumps("spot") == '"spot"'
@@ -0,0 +1,9 @@
+from benchmarks.startup import IMPORT_TIME_BUDGET, LAZY_MODULES, profile_imports, total_seconds
+
+
+def test__app_import_time() -> None:
+    imports = profile_imports("src.app")
+
+    assert total_seconds(imports) < IMPORT_TIME_BUDGET
+    loaded = {item.module.split(".")[0] for item in imports}
+    assert loaded.isdisjoint(LAZY_MODULES)
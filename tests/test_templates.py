@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import pytest
+from jinja2 import TemplateSyntaxError
+
+from src.templates import TemplateIndex, TemplateSnapshot
+
+
+@pytest.fixture
+def templates_dir(tmp_path: Path) -> Path:
+    paths = [
+        "_default/server.yaml.jinja2",
+        "backend/_default/cronjob.yaml.jinja2",
+        "backend/python/server.yaml.jinja2",
+    ]
+    for path in paths:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text("")
+    return tmp_path
+
+
+@pytest.mark.parametrize(
+    ("team", "language", "file_name", "expected"),
+    [
+        ("backend", "python", "server.yaml.jinja2", "backend/python/server.yaml.jinja2"),
+        ("backend", "python", "cronjob.yaml.jinja2", "backend/_default/cronjob.yaml.jinja2"),
+        ("backend", "go", "server.yaml.jinja2", "_default/server.yaml.jinja2"),
+        ("frontend", "python", "server.yaml.jinja2", "_default/server.yaml.jinja2"),
+        ("frontend", "python", "cronjob.yaml.jinja2", None),
+    ],
+)
+def test__template_snapshot_resolve(
+    templates_dir: Path, team: str, language: str, file_name: str, expected: str | None
+) -> None:
+    snapshot = TemplateSnapshot.load(templates_dir)
+    assert snapshot.resolve(team, language, file_name) == expected
+
+
+async def test__template_snapshot_renders_from_memory(templates_dir: Path) -> None:
+    (templates_dir / "_default" / "base.yaml.jinja2").write_text("kind: {% block kind %}{% endblock %}")
+    (templates_dir / "_default" / "job.yaml.jinja2").write_text(
+        '{% extends "_default/base.yaml.jinja2" %}{% block kind %}Job{% endblock %}'
+    )
+    (templates_dir / "_default" / "tolerations.yaml").write_text("_default: [{key: dedicated}]")
+    snapshot = TemplateSnapshot.load(templates_dir)
+    for path in templates_dir.rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+    assert await snapshot.environment.get_template("_default/job.yaml.jinja2").render_async() == "kind: Job"
+    assert snapshot.defaults["_default/tolerations.yaml"] == {"_default": [{"key": "dedicated"}]}
+
+
+def test__template_index_swaps_snapshot_on_change(templates_dir: Path) -> None:
+    index = TemplateIndex(templates_dir, check_interval=0)
+    pinned = index.snapshot
+    assert pinned.resolve("frontend", "python", "cronjob.yaml.jinja2") is None
+
+    (templates_dir / "_default" / "cronjob.yaml.jinja2").write_text("")
+    assert index.snapshot is pinned
+    index.refresh()
+
+    assert index.snapshot.resolve("frontend", "python", "cronjob.yaml.jinja2") == "_default/cronjob.yaml.jinja2"
+    assert index.snapshot.version != pinned.version
+    assert pinned.resolve("frontend", "python", "cronjob.yaml.jinja2") is None
+
+
+def test__template_index_keeps_snapshot_on_error(templates_dir: Path) -> None:
+    index = TemplateIndex(templates_dir, check_interval=0)
+    snapshot = index.snapshot
+
+    (templates_dir / "_default" / "server.yaml.jinja2").write_text("{% if %}")
+    with pytest.raises(TemplateSyntaxError):
+        index.reload()
+
+    assert index.snapshot is snapshot
+
+
+def test__template_snapshot_skips_hidden_and_binary_files(templates_dir: Path) -> None:
+    (templates_dir / ".git" / "objects").mkdir(parents=True)
+    (templates_dir / ".git" / "objects" / "pack").write_bytes(b"\x89\xff\x00")
+    (templates_dir / ".editorconfig").write_text("root = true")
+    (templates_dir / "_default" / "logo.png").write_bytes(b"\x89PNG\r\n\x1a\n\xff")
+    index = TemplateIndex(templates_dir, check_interval=0)
+
+    assert sorted(index.snapshot.sources) == [
+        "_default/server.yaml.jinja2",
+        "backend/_default/cronjob.yaml.jinja2",
+        "backend/python/server.yaml.jinja2",
+    ]
+    version = index.snapshot.version
+    (templates_dir / ".git" / "objects" / "pack").write_bytes(b"\x89\xff\x00\x01")
+    index.refresh()
+    assert index.snapshot.version == version
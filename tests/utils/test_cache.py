@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from src.utils.cache import SingleFlight
+
+
+async def test__single_flight() -> None:
+    flights: SingleFlight[str] = SingleFlight("test")
+    release = asyncio.Event()
+    calls = 0
+
+    async def render() -> str:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "rendered"
+
+    waiters = [asyncio.create_task(flights.run("key", render)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flights.stats() == {"in_flight": 1, "leaders": 1, "followers": 4}
+
+    # The leader going away does not cancel the render its followers wait for.
+    waiters[0].cancel()
+    release.set()
+    assert await asyncio.gather(*waiters[1:]) == ["rendered"] * 4
+    assert calls == 1
+    assert flights.stats()["in_flight"] == 0
+
+    assert await flights.run("key", render) == "rendered"
+    assert calls == 2
+
+
+async def test__single_flight_error() -> None:
+    flights: SingleFlight[str] = SingleFlight("test")
+
+    async def render() -> str:
+        await asyncio.sleep(0)
+        raise ValueError("broken template")
+
+    results = await asyncio.gather(*[flights.run("key", render) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats() == {"in_flight": 0, "leaders": 1, "followers": 2}
+
+    with pytest.raises(ValueError, match="broken template"):
+        await flights.run("key", render)
@@ -0,0 +1,15 @@
+from src.utils.cache import TTLCache
+from src.utils.encrypter import AesEncoder
+
+
+def test__decrypt_many() -> None:
+    encoder = AesEncoder(AesEncoder.generate_key())
+    values = [b"first", b"second", b"first"]
+    encrypted = [encoder.encrypt(value).encode() for value in values]
+
+    cache: TTLCache[bytes] = TTLCache(maxsize=16, ttl=60)
+    assert encoder.decrypt_many(encrypted, cache=cache) == values
+    assert encoder.decrypt_many(encrypted, cache=cache) == values
+    assert cache.stats() == {"size": 3, "maxsize": 16, "hits": 3, "misses": 3}
+
+    assert encoder.decrypt_many(encrypted) == values